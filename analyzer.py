@@ -1,57 +1,50 @@
-# from typing import Tuple, List
-
-# from utils.safe_browsing import check_safe_browsing
-# from concurrent.futures import ThreadPoolExecutor, as_completed
-
-# from checker.url_checker import (
-#     check_https,
-#     check_short_domain,
-#     check_contains_suspicious_words,
-#     check_safe_browsing_status
-# )
-
-# def rate_site(url: str) -> Tuple[str, List[str], str]:
-#     score = 0
-#     reasons = []
-
-#     checks = [
-#         ("https", check_https),
-#         ("short_domain", check_short_domain),
-#         ("suspicious_words", check_contains_suspicious_words),
-#         ("safe_browsing", check_safe_browsing_status)
-#     ]
-
-#     with ThreadPoolExecutor(max_workers=4) as executor:
-#         futures = {
-#             executor.submit(func, url): name
-#             for name, func in checks
-#         }
-
-#         for future in as_completed(futures):
-#             task_name = futures[future]
-#             result = future.result()
-
-#             if task_name == 'https' and not result:
-#                 score += 1
-#                 reasons.append("Não utiliza HTTPS")
-
-#             elif task_name == 'short_domain' and result:
-#                 score += 1
-#                 reasons.append("Domínio muito curto")
-
-#             elif task_name == 'suspicious_words' and result:
-#                 score += 1
-#                 reasons.append("Contém palavras suspeitas")
-
-#             elif task_name == 'safe_browsing':
-#                 suspect, reason_sb = result
-#                 if suspect:
-#                     score += 1
-#                     reasons.append(reason_sb)
-
-#     if score == 0:
-#         return "✅ Provavelmente legítimo", reasons, "green"
-#     elif score == 1:
-#         return "⚠️ Potencialmente suspeito", reasons, "yellow"
-#     else:
-#         return "❌ Alta suspeita de site fraudulento", reasons, "red"
\ No newline at end of file
+import os
+from typing import List, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Talks to scoring/service.py, which keeps the model and the caches warm.
+SCORING_SERVICE_URL = os.getenv("SCORING_SERVICE_URL", "http://127.0.0.1:8080")
+
+# Reason shown when a feature has the given value.
+REASONS = {
+    ("uses_https", 0): "Não utiliza HTTPS",
+    ("short_domain", 1): "Domínio muito curto",
+    ("has_suspicious_words", 1): "Contém palavras suspeitas",
+    ("safe_browsing", 1): "Marcado pelo Google Safe Browsing",
+    ("has_many_redirects", 1): "Muitos redirecionamentos",
+    ("listed_in_rbl", 1): "IP listado em blacklist (RBL)",
+    ("ip_from_untrusted_country", 1): "IP hospedado em país não confiável",
+    ("indexed_by_google", 0): "Não indexado pelo Google",
+    ("has_low_domain_age", 1): "Domínio registrado recentemente",
+    ("has_few_days_to_expire", 1): "Domínio perto de expirar",
+    ("is_ip_domain", 1): "Usa IP no lugar do domínio",
+    ("has_at_symbol", 1): "Contém '@' na URL",
+    ("has_double_slash", 1): "Contém '//' no caminho",
+    ("has_phishing_query_params", 1): "Parâmetros típicos de phishing",
+    ("nonstandard_port", 1): "Porta não padrão",
+    ("url_shortener", 1): "Usa encurtador de URL",
+    ("has_high_response_time", 1): "Tempo de resposta alto",
+}
+
+
+def rate_site(url: str) -> Tuple[str, List[str], str]:
+    response = requests.post(f"{SCORING_SERVICE_URL}/score", json={"url": url}, timeout=60)
+    response.raise_for_status()
+    result = response.json()
+
+    reasons = [
+        reason
+        for (name, value), reason in REASONS.items()
+        if result["features"].get(name) == value
+    ]
+    probability = result["probability"]
+    if probability < 0.3:
+        return "✅ Provavelmente legítimo", reasons, "green"
+    elif probability < 0.5:
+        return "⚠️ Potencialmente suspeito", reasons, "yellow"
+    else:
+        return "❌ Alta suspeita de site fraudulento", reasons, "red"
@@ -0,0 +1,68 @@
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+
+def load(path: str) -> Tuple[Dict, Dict[Tuple[str, str], Dict]]:
+    with open(path) as f:
+        report = json.load(f)
+    return report, {(run["mode"], str(run["size"])): run for run in report["runs"]}
+
+
+def change(base: float, new: float) -> str:
+    if not base:
+        return "    -"
+    return f"{(new - base) / base:+6.1%}"
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> bool:
+    """Prints new against base for every run both have; False if throughput dropped past threshold."""
+    base_report, base_runs = load(base_path)
+    new_report, new_runs = load(new_path)
+    print(f"base {base_report['commit']} ({base_report['created_at']})")
+    print(f"novo {new_report['commit']} ({new_report['created_at']})")
+
+    ok = True
+    for key in sorted(base_runs.keys() & new_runs.keys()):
+        base, new = base_runs[key], new_runs[key]
+        print()
+        print(f"== {key[0]} {key[1]} ==")
+        print(
+            f"URLs/s     {base['urls_per_sec']:>10.1f} -> {new['urls_per_sec']:>10.1f}  "
+            f"{change(base['urls_per_sec'], new['urls_per_sec'])}"
+        )
+        print(
+            f"pico RSS   {base['peak_rss_mb']:>10.0f} -> {new['peak_rss_mb']:>10.0f}  "
+            f"{change(base['peak_rss_mb'], new['peak_rss_mb'])}"
+        )
+        print(
+            f"threads    {base['peak_threads']:>10} -> {new['peak_threads']:>10}  "
+            f"{change(base['peak_threads'], new['peak_threads'])}"
+        )
+        print(f"{'check':<28}{'p50 base':>10}{'p50 novo':>10}{'p95 base':>10}{'p95 novo':>10}{'Δp95':>9}")
+        for name in sorted(base["checks"].keys() & new["checks"].keys()):
+            b, n = base["checks"][name], new["checks"][name]
+            print(
+                f"{name:<28}{b['p50_ms']:>10.1f}{n['p50_ms']:>10.1f}"
+                f"{b['p95_ms']:>10.1f}{n['p95_ms']:>10.1f}{change(b['p95_ms'], n['p95_ms']):>9}"
+            )
+        if new["urls_per_sec"] < base["urls_per_sec"] * (1 - threshold):
+            print(f"[REGRESSÃO] throughput caiu mais de {threshold:.0%}")
+            ok = False
+    return ok
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compara dois resultados de benchmarks/run.py.")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="queda de URLs/s tolerada antes de falhar (fração, padrão 0.1)"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(0 if compare(args.base, args.new, args.threshold) else 1)
@@ -0,0 +1,68 @@
+import csv
+import random
+from typing import Iterator, Tuple
+
+from benchmarks.stubs import DEAD_PREFIX, MALWARE_PREFIX
+from features.wordlists import PHISHING_PARAMS, SUSPICIOUS_WORD
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+TLDS = ["com", "net", "org", "com.br", "info"]
+
+# Redirect hops before the final page and their weights; more than 3 hops
+# sets has_many_redirects.
+HOPS = [0, 1, 2, 4]
+HOP_WEIGHTS = [50, 25, 15, 10]
+
+
+def parse_size(size: str) -> int:
+    return SIZES[size] if size in SIZES else int(size)
+
+
+def synthetic_urls(n: int, port: int, seed: int = 42, domain_ratio: float = 0.2) -> Iterator[Tuple[str, str]]:
+    """
+    Yields n (url, type) rows for the stub server listening on port. About
+    domain_ratio * n registered domains are drawn with a skew towards the
+    first ones, as in real crawls, so domain-level caches see repeats. The
+    same seed gives the same rows, apart from the port.
+    """
+    rng = random.Random(seed)
+    domains = max(1, int(n * domain_ratio))
+    for _ in range(n):
+        index = int(domains * rng.random() ** 2)
+        name = f"site{index}"
+        bad = rng.random() < 0.2
+        roll = rng.random()
+        if roll < 0.03:
+            name = DEAD_PREFIX + name
+        elif roll < 0.05:
+            name = MALWARE_PREFIX + name
+            bad = True
+        elif roll < 0.15:
+            name = f"my-{name}-online"
+        host = f"{name}.{TLDS[index % len(TLDS)]}"
+        if rng.random() < 0.2:
+            host = rng.choice(["www.", "m.", "a.b.c."]) + host
+
+        path = f"page{rng.randrange(1000)}"
+        if rng.random() < 0.15:
+            path = f"{rng.choice(SUSPICIOUS_WORD)}/{path}"
+            bad = True
+        params = [f"p{i}={rng.randrange(100)}" for i in range(rng.choice([0, 0, 1, 2, 6]))]
+        if rng.random() < 0.05:
+            params.append(f"{rng.choice(PHISHING_PARAMS)}=x")
+        query = "?" + "&".join(params) if params else ""
+
+        hops = rng.choices(HOPS, HOP_WEIGHTS)[0]
+        # Mostly fast pages with a long tail past has_high_response_time.
+        delay_ms = min(int(rng.expovariate(1 / 60)), 2500)
+        url = f"http://{host}:{port}/r/{hops}/d/{delay_ms}/{path}{query}"
+        yield url, "bad" if bad else "good"
+
+
+def write_dataset(path: str, n: int, port: int, seed: int = 42) -> None:
+    """Writes a CSV with the url and type columns main.py reads."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["url", "type"])
+        writer.writerows(synthetic_urls(n, port, seed))
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from typing import Dict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from benchmarks.dataset import SIZES, parse_size, write_dataset
+from benchmarks.stubs import StubServer, fake_whois
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+MODES = ("engine", "sync")
+
+# Upstream rate budgets are off: the stubs are local and the point is to
+# measure the pipeline, not the throttling.
+UNLIMITED = {
+    f"RATE_LIMIT_{service}": "0" for service in ("TARGET", "SAFE_BROWSING", "IPINFO", "GOOGLE", "RBL", "WHOIS")
+}
+
+
+class PeakSampler(threading.Thread):
+    """Samples the process' thread count every interval seconds and keeps the peak."""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    @staticmethod
+    def threads() -> int:
+        # /proc also sees native threads (e.g. resolver or SQLite workers).
+        try:
+            return len(os.listdir("/proc/self/task"))
+        except OSError:
+            return threading.active_count()
+
+    def run(self) -> None:
+        while not self._done.is_set():
+            self.peak = max(self.peak, self.threads())
+            self._done.wait(self.interval)
+
+    def stop(self) -> int:
+        self._done.set()
+        self.join()
+        return self.peak
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_sync(input_path: str, max_in_flight: int) -> int:
+    """The get_url_features path, one URL per worker thread."""
+    from builder_csv import get_url_features, is_valid_feature_set
+
+    with open(input_path, newline="", encoding="utf-8") as f:
+        urls = [row["url"] for row in csv.DictReader(f)]
+    extract = partial(get_url_features, preflight=True)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        return sum(is_valid_feature_set(features) for features in pool.map(extract, urls))
+
+
+def run_engine(input_path: str, output_path: str, max_in_flight: int) -> int:
+    """The main.py path: build_dataset over the async engine."""
+    from dataset_builder import build_dataset
+
+    asyncio.run(build_dataset(input_path, output_path, max_in_flight=max_in_flight, fresh=True))
+    with open(output_path, encoding="utf-8") as f:
+        return sum(1 for _ in f) - 1
+
+
+def child(args) -> None:
+    """One measured run, in a fresh process so caches and RSS start empty."""
+    from features.whois_cache import whois_cache
+    from utils.metrics import metrics
+
+    whois_cache.lookup = fake_whois(args.whois_latency_ms)
+    rss_start = peak_rss_mb()
+    sampler = PeakSampler()
+    sampler.start()
+    started = time.perf_counter()
+    if args.child == "engine":
+        rows = run_engine(args.input, args.result + ".csv", args.max_in_flight)
+    else:
+        rows = run_sync(args.input, args.max_in_flight)
+    seconds = time.perf_counter() - started
+
+    with open(args.input, encoding="utf-8") as f:
+        urls = sum(1 for _ in f) - 1
+    result = {
+        "mode": args.child,
+        "urls": urls,
+        "rows": rows,
+        "seconds": seconds,
+        "urls_per_sec": urls / seconds,
+        "rss_start_mb": rss_start,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_threads": sampler.stop(),
+        "checks": metrics.snapshot(),
+    }
+    with open(args.result, "w") as f:
+        json.dump(result, f)
+
+
+def measure(mode: str, input_path: str, workdir: str, stubs: StubServer, args) -> Dict:
+    name = f"{mode}-{os.path.basename(input_path)}"
+    result_path = os.path.join(workdir, name + ".json")
+    env = dict(os.environ, **stubs.env, **UNLIMITED)
+    env["WHOIS_CACHE_PATH"] = os.path.join(workdir, name + ".whois.sqlite")
+    env["FEATURE_STORE_PATH"] = os.path.join(workdir, name + ".features.sqlite")
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", mode,
+        "--input", input_path, "--result", result_path,
+        "--max-in-flight", str(args.max_in_flight), "--whois-latency-ms", str(args.whois_latency_ms),
+    ]
+    before = dict(stubs.requests)
+    subprocess.run(command, env=env, cwd=ROOT, check=True, stdout=None if args.verbose else subprocess.DEVNULL)
+    with open(result_path) as f:
+        result = json.load(f)
+    result["upstream_requests"] = {
+        service: count - before.get(service, 0) for service, count in stubs.requests.items()
+    }
+    return result
+
+
+def main(args) -> None:
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "seed": args.seed,
+            "max_in_flight": args.max_in_flight,
+            "api_latency_ms": args.api_latency_ms,
+            "dns_latency_ms": args.dns_latency_ms,
+            "whois_latency_ms": args.whois_latency_ms,
+        },
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir, StubServer(args.api_latency_ms, args.dns_latency_ms) as stubs:
+        for size in args.sizes:
+            n = parse_size(size)
+            input_path = os.path.join(workdir, f"urls-{n}.csv")
+            write_dataset(input_path, n, stubs.http_port, args.seed)
+            for mode in args.modes:
+                print(f"[BENCH] {mode} com {n} URLs...")
+                result = measure(mode, input_path, workdir, stubs, args)
+                result["size"] = size
+                report["runs"].append(result)
+                print(
+                    f"[BENCH] {mode} {n}: {result['urls_per_sec']:.1f} URLs/s, {result['rows']} linhas, "
+                    f"pico RSS {result['peak_rss_mb']:.0f} MiB, pico threads {result['peak_threads']}"
+                )
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{report['commit']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados gravados em {output}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Mede a extração de features contra servidores locais (HTTP, DNS/RBL, WHOIS, Safe Browsing, ipinfo)."
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", default=["1k", "10k"], help=f"tamanhos do dataset sintético ({', '.join(SIZES)} ou um número)"
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--max-in-flight", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--api-latency-ms", type=float, default=20.0)
+    parser.add_argument("--dns-latency-ms", type=float, default=2.0)
+    parser.add_argument("--whois-latency-ms", type=float, default=50.0)
+    parser.add_argument("--output", help="arquivo JSON de saída (padrão: benchmarks/results/<commit>-<data>.json)")
+    parser.add_argument("--verbose", action="store_true", help="mostra a saída do pipeline")
+    # Internal: a single measured run, started by the parent process.
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.child:
+        child(args)
+    else:
+        main(args)
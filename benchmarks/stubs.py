@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+from aiohttp import web
+
+from features.wordlists import RBL_SERVERS
+
+# Host prefixes the synthetic datasets use to ask for a given behaviour.
+DEAD_PREFIX = "dead-"
+MALWARE_PREFIX = "malware-"
+
+PAGE = b"<html><head><title>bench</title></head><body>" + b"x" * 8192 + b"</body></html>"
+
+
+def _stable_hash(text: str) -> int:
+    return zlib.crc32(text.encode())
+
+
+class StubServer:
+    """
+    Local stand-in for everything the checks talk to, on one event loop in
+    a background thread:
+
+    - an HTTP server that is also an HTTP proxy for the synthetic targets.
+      /r/<hops>/d/<ms>/... answers after ms milliseconds with a redirect to
+      /r/<hops-1>/d/<ms>/..., and with a page once hops reaches 0;
+    - the Safe Browsing threatMatches:find, ipinfo and Google search
+      endpoints, each answering after api_latency_ms;
+    - a UDP DNS server: every name resolves to 127.0.0.1 except names with
+      a label starting with "dead-" (NXDOMAIN); RBL zones list nothing.
+    """
+
+    def __init__(self, api_latency_ms: float = 20.0, dns_latency_ms: float = 2.0):
+        self.api_latency = api_latency_ms / 1000
+        self.dns_latency = dns_latency_ms / 1000
+        self.http_port: Optional[int] = None
+        self.dns_port: Optional[int] = None
+        self.requests: Dict[str, int] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runner: Optional[web.AppRunner] = None
+        self._transport = None
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    @property
+    def env(self) -> Dict[str, str]:
+        """Environment that points the pipeline at the stubs."""
+        base = f"http://127.0.0.1:{self.http_port}"
+        return {
+            "HTTP_PROXY": base,
+            "http_proxy": base,
+            "NO_PROXY": "127.0.0.1,localhost",
+            "no_proxy": "127.0.0.1,localhost",
+            "DNS_NAMESERVERS": f"127.0.0.1:{self.dns_port}",
+            "GOOGLE_API_KEY": "bench",
+            "SAFE_BROWSING_API_BASE": f"{base}/v4",
+            "SAFE_BROWSING_MODE": "lookup",
+            "IPINFO_URL": base + "/ipinfo/{ip}/json",
+            "GOOGLE_SEARCH_URL": base + "/search?q=site:{domain}",
+            "GEOIP_DB_PATH": "",
+        }
+
+    async def _start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/v4/threatMatches:find", self._safe_browsing)
+        app.router.add_get("/ipinfo/{ip}/json", self._ipinfo)
+        app.router.add_get("/search", self._google)
+        app.router.add_route("*", r"/r/{hops:\d+}/d/{ms:\d+}{tail:.*}", self._target)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0, backlog=1024)
+        await site.start()
+        self.http_port = site._server.sockets[0].getsockname()[1]
+
+        self._transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _DNSProtocol(self), local_addr=("127.0.0.1", 0)
+        )
+        self.dns_port = self._transport.get_extra_info("sockname")[1]
+
+    async def _stop(self) -> None:
+        self._transport.close()
+        await self._runner.cleanup()
+
+    def _count(self, name: str) -> None:
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+    async def _target(self, request: web.Request) -> web.Response:
+        self._count("target")
+        hops = int(request.match_info["hops"])
+        await asyncio.sleep(int(request.match_info["ms"]) / 1000)
+        if hops > 0:
+            location = f"/r/{hops - 1}/d/{request.match_info['ms']}{request.match_info['tail']}"
+            return web.Response(status=302, headers={"Location": location})
+        return web.Response(body=PAGE, content_type="text/html")
+
+    async def _safe_browsing(self, request: web.Request) -> web.Response:
+        self._count("safe_browsing")
+        payload = await request.json()
+        await asyncio.sleep(self.api_latency)
+        matches = [
+            {"threatType": "MALWARE", "threat": {"url": entry["url"]}, "cacheDuration": "300s"}
+            for entry in payload["threatInfo"]["threatEntries"]
+            if MALWARE_PREFIX in entry["url"]
+        ]
+        return web.json_response({"matches": matches} if matches else {})
+
+    async def _ipinfo(self, request: web.Request) -> web.Response:
+        self._count("ipinfo")
+        await asyncio.sleep(self.api_latency)
+        return web.json_response({"ip": request.match_info["ip"], "country": "DE"})
+
+    async def _google(self, request: web.Request) -> web.Response:
+        self._count("google")
+        await asyncio.sleep(self.api_latency)
+        domain = request.query.get("q", "").partition("site:")[2]
+        if _stable_hash(domain) % 4 == 0:
+            return web.Response(text="<html>Not found result</html>", content_type="text/html")
+        return web.Response(body=PAGE, content_type="text/html")
+
+
+class _DNSProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: StubServer):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.server._count("dns")
+        query = dns.message.from_wire(data)
+        response = dns.message.make_response(query)
+        name = query.question[0].name.to_text().rstrip(".")
+        rdtype = query.question[0].rdtype
+        dead = any(label.startswith(DEAD_PREFIX) for label in name.split("."))
+        if dead or any(name.endswith(zone) for zone in RBL_SERVERS):
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        elif rdtype == dns.rdatatype.A:
+            response.answer.append(dns.rrset.from_text(name + ".", 300, "IN", "A", "127.0.0.1"))
+        wire = response.to_wire()
+        asyncio.get_running_loop().call_later(self.server.dns_latency, self.transport.sendto, wire, addr)
+
+
+class FakeWhois(dict):
+    """Quacks like python-whois' WhoisEntry: a dict with attribute access."""
+
+    __getattr__ = dict.get
+
+
+def fake_whois(latency_ms: float = 50.0):
+    """WHOIS lookup with fixed latency and dates derived from the domain."""
+
+    def lookup(domain: str) -> FakeWhois:
+        time.sleep(latency_ms / 1000)
+        h = _stable_hash(domain)
+        now = datetime.now()
+        return FakeWhois(
+            creation_date=now - timedelta(days=h % 4000),
+            expiration_date=now + timedelta(days=h % 700),
+        )
+
+    return lookup
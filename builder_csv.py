@@ -1,4 +1,9 @@
-import concurrent
+import concurrent.futures
+import os
+import time
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
 from features.features import (
     check_contains_suspicious_words,
     check_has_few_days_to_expire,
@@ -21,45 +26,169 @@ from features.features import (
     check_has_many_subdomains,
     check_url_shortener,
 )
+from features.names import LEXICAL_FEATURES
+from features.preflight import Preflight, preflight as run_preflight
+from features.validate import URLContext, resolve_url
+from utils.metrics import metrics
+from utils.timeouts import FEATURE_TIMEOUT, timeouts
+
+load_dotenv()
+
+# Checks that need the fetched page receive the shared URLContext instead of
+# fetching it again themselves.
+CONTEXT_CHECKS = {
+    "safe_browsing",
+    "has_many_redirects",
+    "ip_from_untrusted_country",
+    "indexed_by_google",
+    "has_low_domain_age",
+    "has_few_days_to_expire",
+    "has_high_response_time",
+}
+
+# Checks whose result only depends on the registered domain, not on the
+# rest of the URL; dataset builds compute them once per domain.
+DOMAIN_CHECKS = {
+    "has_low_domain_age",
+    "has_few_days_to_expire",
+    "listed_in_rbl",
+    "ip_from_untrusted_country",
+    "indexed_by_google",
+}
+
+
+FEATURE_CHECKS = {
+    "uses_https": check_https,
+    "short_domain": check_short_domain,
+    "has_suspicious_words": check_contains_suspicious_words,
+    "safe_browsing": check_safe_browsing_status,
+    "has_many_redirects": check_has_many_redirects,
+    "listed_in_rbl": check_domain_in_rbl,
+    "ip_from_untrusted_country": check_ip_from_untrusted_country,
+    "indexed_by_google": check_indexed_by_google,
+    "has_low_domain_age": check_has_low_domain_age,
+    "has_few_days_to_expire": check_has_few_days_to_expire,
+    "is_ip_domain": check_domain_is_ip,
+    "has_at_symbol": check_has_at_symbol,
+    "has_double_slash": check_double_slash_redirect,
+    "has_hyphen": check_hyphen_in_domain,
+    "subdomain_count": check_has_many_subdomains,
+    "query_params_count": check_has_many_query_params,
+    "has_phishing_query_params": check_phishing_query_params,
+    "nonstandard_port": check_nonstandard_port,
+    "url_shortener": check_url_shortener,
+    "has_high_response_time": check_has_high_response_time,
+}
+
+
+def binary_label(label: str) -> int:
+    return 0 if label.lower() == "good" else 1
+
+
+# Features a dataset row needs; see is_valid_feature_set.
+REQUIRED_FEATURES = [
+    "has_few_days_to_expire",
+    "has_low_domain_age",
+    "ip_from_untrusted_country",
+    "has_many_redirects",
+    "has_high_response_time",
+    "listed_in_rbl"
+]
+
+
+def is_valid_feature_set(features: Dict, threshold: float = 0.7) -> bool:
+    selected = {k: features.get(k, -1) for k in REQUIRED_FEATURES}
+    total = len(selected)
+    valid = sum(1 for v in selected.values() if v not in (-1, FEATURE_TIMEOUT, None))
+
+    return (valid / total) >= threshold if total > 0 else False
+
 
+def worth_checking(check: Preflight, threshold: float = 0.7) -> bool:
+    """
+    Whether the URL can still pass is_valid_feature_set given what
+    pre-flight showed, assuming every feature it did not rule out succeeds.
+    """
+    best_case = {k: -1 if k in check.lost_features else 0 for k in REQUIRED_FEATURES}
+    return is_valid_feature_set(best_case, threshold)
 
-def get_url_features(url: str) -> dict:
-    funcs = {
-        "uses_https": check_https,
-        "short_domain": check_short_domain,
-        "has_suspicious_words": check_contains_suspicious_words,
-        "safe_browsing": check_safe_browsing_status,
-        "has_many_redirects": check_has_many_redirects,
-        "listed_in_rbl": check_domain_in_rbl,
-        "ip_from_untrusted_country": check_ip_from_untrusted_country,
-        "indexed_by_google": check_indexed_by_google,
-        "has_low_domain_age": check_has_low_domain_age,
-        "has_few_days_to_expire": check_has_few_days_to_expire,
-        "is_ip_domain": check_domain_is_ip,
-        "has_at_symbol": check_has_at_symbol,
-        "has_double_slash": check_double_slash_redirect,
-        "has_hyphen": check_hyphen_in_domain,
-        "subdomain_count": check_has_many_subdomains,
-        "query_params_count": check_has_many_query_params,
-        "has_phishing_query_params": check_phishing_query_params,
-        "nonstandard_port": check_nonstandard_port,
-        "url_shortener": check_url_shortener,
-        "has_high_response_time": check_has_high_response_time,
+
+def short_circuit(url: str) -> dict:
+    """Features of a URL not worth checking: lexical ones only, the rest -1."""
+    return {
+        key: run_check(key, func, url) if key in LEXICAL_FEATURES else -1
+        for key, func in FEATURE_CHECKS.items()
     }
+
+
+def normalize_result(res):
+    if isinstance(res, (bool)):
+        return int(res)
+    if isinstance(res, (list, tuple)):
+        return int(res[0]) if res else 0
+    return res
+
+
+def run_check(name: str, func, *args, **kwargs):
+    """Runs one check under metrics.track, so its time and outcome are recorded."""
+    with metrics.track(name) as call:
+        result = func(*args, **kwargs)
+        # A timeout the check caught itself is still reported as one.
+        call.result = FEATURE_TIMEOUT if call.outcome == "timeout" else normalize_result(result)
+    return call.result
+
+
+# Thread pool shared by every get_url_features call of the process. Most
+# checks block on the network, so it is sized like the scheduler's global
+# in-flight cap.
+check_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("CHECK_WORKERS", 256)), thread_name_prefix="check"
+)
+
+
+def fetch(url: str, deadline: Optional[float] = None) -> URLContext:
+    with metrics.track("fetch") as call:
+        context = resolve_url(url, timeouts.budget("fetch", deadline))
+        call.result = 0 if context.ok else -1
+    return context
+
+
+def get_url_features(url: str, preflight: bool = False) -> dict:
+    """
+    Runs every check of url on the shared check pool. When the URL's
+    deadline expires, its checks still queued are cancelled and those still
+    running are abandoned; both are reported as FEATURE_TIMEOUT.
+    With preflight=True, URLs whose host is dead or does not resolve badly
+    enough to fail is_valid_feature_set skip the network checks entirely.
+    """
+    if preflight and not worth_checking(run_preflight(url)):
+        print(f"[PREFLIGHT] {url}: host unreachable, network checks skipped")
+        return short_circuit(url)
+
     results = {}
+    deadline = timeouts.deadline_at()
+    context = fetch(url, deadline)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future_to_key = {executor.submit(func, url): key for key, func in funcs.items()}
-        for future in concurrent.futures.as_completed(future_to_key):
+    future_to_key = {
+        (
+            check_executor.submit(run_check, key, func, url, context=context)
+            if key in CONTEXT_CHECKS
+            else check_executor.submit(run_check, key, func, url)
+        ): key
+        for key, func in FEATURE_CHECKS.items()
+    }
+    remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+    try:
+        for future in concurrent.futures.as_completed(future_to_key, timeout=remaining):
             key = future_to_key[future]
             try:
-                res = future.result()
-                if isinstance(res, (bool)):
-                    res = int(res)
-                elif isinstance(res, (list, tuple)):
-                    res = int(res[0]) if res else 0
-                results[key] = res
+                results[key] = future.result()
             except Exception as e:
                 results[key] = -1
+    except concurrent.futures.TimeoutError:
+        for future, key in future_to_key.items():
+            # The pool is shared, so only this URL's queued checks are cancelled.
+            future.cancel()
+            results.setdefault(key, FEATURE_TIMEOUT)
 
     return results
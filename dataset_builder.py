@@ -0,0 +1,192 @@
+import asyncio
+import csv
+import json
+import os
+from functools import partial
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from builder_csv import FEATURE_CHECKS, binary_label, is_valid_feature_set, normalize_result
+from engine import FeatureEngine, SharedResults
+from features.parsing import normalize_url
+from features.store import FeatureStore, feature_store
+from utils.timeouts import FEATURE_TIMEOUT
+
+OUTPUT_COLUMNS = list(FEATURE_CHECKS) + ["url", "label"]
+
+
+class Checkpoint:
+    """
+    Tracks which input rows are finished. Every row below `watermark` is
+    done; `done` only holds finished rows above it, so the state stays as
+    small as the number of rows in flight. `output_offset` is the size of
+    the output file when the state was saved: anything after it belongs to
+    rows not yet checkpointed and is truncated on resume.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.watermark = 0
+        self.done = set()
+        self.output_offset = 0
+        self.pending = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.watermark = state["watermark"]
+            self.done = set(state["done"])
+            self.output_offset = state["output_offset"]
+
+    def is_done(self, index: int) -> bool:
+        return index < self.watermark or index in self.done
+
+    def mark(self, index: int) -> None:
+        self.done.add(index)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+        self.pending += 1
+
+    def save(self, output_offset: int) -> None:
+        self.output_offset = output_offset
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {"watermark": self.watermark, "done": sorted(self.done), "output_offset": output_offset},
+                f,
+            )
+        os.replace(tmp, self.path)
+        self.pending = 0
+
+
+async def extract_features(
+    engine: FeatureEngine, url: str, store: Optional[FeatureStore] = None, recompute: bool = False
+) -> Dict:
+    """
+    With a store, only features that are missing or expired there are
+    extracted (all of them with recompute) and the new values are saved.
+    SQLite may wait on another shard's write lock, so the store is used
+    from a worker thread, off the event loop.
+    """
+    if store is None:
+        return await engine.extract(url)
+    stored = {} if recompute else await asyncio.to_thread(store.fresh, url)
+    computed = await engine.extract(url, [name for name in FEATURE_CHECKS if name not in stored])
+    await asyncio.to_thread(store.put, url, computed)
+    return {name: stored[name] if name in stored else computed[name] for name in FEATURE_CHECKS}
+
+
+def _complete(features: Dict) -> bool:
+    """Extractions with errors or timeouts are not shared, so a later row retries them."""
+    return not any(normalize_result(value) in (-1, FEATURE_TIMEOUT) for value in features.values())
+
+
+async def process_row(
+    engine: FeatureEngine,
+    row,
+    store: Optional[FeatureStore] = None,
+    recompute: bool = False,
+    urls: Optional[SharedResults] = None,
+) -> Optional[Dict]:
+    """
+    Features and label of one input row. With urls, rows repeating a URL
+    (after normalize_url) share one extraction.
+    """
+    url = row["url"]
+    label_str = row["type"]
+    label = binary_label(label_str)
+    if urls is None or not isinstance(url, str):
+        features = await extract_features(engine, url, store, recompute)
+    else:
+        shared = urls.get(normalize_url(url), partial(extract_features, engine, url, store, recompute))
+        # Every row gets its own copy: url and label are added below.
+        features = dict(await shared)
+
+    if not is_valid_feature_set(features):
+        print(f"[SKIPPED] {url} removida por baixa qualidade de features.")
+        return None
+
+    features["url"] = url
+    features["label"] = label
+    return features
+
+
+def _pending_rows(input_path: str, checkpoint: Checkpoint, chunksize: int) -> Iterator[Tuple[int, Dict]]:
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        for index, row in zip(chunk.index, chunk.to_dict(orient="records")):
+            if not checkpoint.is_done(int(index)):
+                yield int(index), row
+
+
+async def build_dataset(
+    input_path: str,
+    output_path: str,
+    checkpoint_path: Optional[str] = None,
+    chunksize: int = 10000,
+    max_in_flight: int = 100,
+    checkpoint_every: int = 100,
+    fresh: bool = False,
+    passthrough: Sequence[str] = (),
+    preflight: bool = True,
+    incremental: bool = True,
+    recompute: bool = False,
+    dedup: bool = True,
+) -> None:
+    """
+    Streams input_path through the engine and appends feature rows to
+    output_path as they finish. Progress is checkpointed every
+    checkpoint_every rows; re-running resumes where the last run stopped.
+    Input columns listed in passthrough are copied to the output as-is.
+    With preflight, dead hosts are dropped before their network checks run.
+    With incremental, values still fresh in the feature store are reused
+    and only missing or expired features are computed; recompute ignores
+    the stored values but still refreshes them.
+    With dedup, repeated URLs are extracted once and domain-scoped
+    features once per registered domain, then fanned out to every row.
+    """
+    store = feature_store if incremental else None
+    urls = SharedResults("url_dedup", keep=_complete) if dedup else None
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+    if fresh and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path)
+
+    if os.path.exists(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(checkpoint.output_offset)
+
+    with open(output_path, "a", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=OUTPUT_COLUMNS + list(passthrough))
+        if checkpoint.output_offset == 0:
+            writer.writeheader()
+
+        def save():
+            out.flush()
+            checkpoint.save(os.path.getsize(output_path))
+
+        async def handle(engine, item):
+            index, row = item
+            features = await process_row(engine, row, store, recompute, urls)
+            if features is not None:
+                features.update({column: row[column] for column in passthrough})
+                writer.writerow(features)
+            checkpoint.mark(index)
+            if checkpoint.pending >= checkpoint_every:
+                save()
+
+        try:
+            async with FeatureEngine(max_urls=max_in_flight, preflight=preflight, dedup=dedup) as engine:
+                await engine.run(_pending_rows(input_path, checkpoint, chunksize), handle)
+                if dedup:
+                    print_dedup(urls, engine.domain_results)
+        finally:
+            save()
+
+
+def print_dedup(urls: SharedResults, domains: SharedResults) -> None:
+    """Rows per extraction and lookups per computation of each domain-scoped check."""
+    rows = urls.stats().get("", {"lookups": 0, "computed": 0, "ratio": 0.0})
+    print(f"[DEDUP] {rows['lookups']} linhas com URL, {rows['computed']} extrações ({rows['ratio']:.2f}x)")
+    for name, stats in domains.stats().items():
+        print(f"[DEDUP] {name}: {stats['computed']} consultas para {stats['lookups']} URLs ({stats['ratio']:.2f}x)")
@@ -0,0 +1,350 @@
+import asyncio
+import contextvars
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional
+
+import aiohttp
+
+from builder_csv import (
+    CONTEXT_CHECKS,
+    DOMAIN_CHECKS,
+    FEATURE_CHECKS,
+    normalize_result,
+    short_circuit,
+    worth_checking,
+)
+from features.dns_cache import dns_cache
+from features.geoip import geoip
+from features.names import LEXICAL_FEATURES
+from features.parsing import parse_url
+from features.preflight import preflight_async
+from features.validate import URLContext
+from utils.http import GOOGLE_SEARCH_URL, HEADERS, IPINFO_URL, http_client
+from utils.metrics import metrics
+from utils.rate_limit import Scheduler, scheduler as default_scheduler
+from utils.safe_browsing import check_safe_browsing_async
+from utils.timeouts import FEATURE_TIMEOUT, AdaptiveTimeouts, timeouts as default_timeouts
+
+# Checks backed by blocking libraries; they run on the engine's shared executor.
+BLOCKING_CHECKS = {"has_low_domain_age", "has_few_days_to_expire"}
+
+
+async def _read_capped(response: aiohttp.ClientResponse, limit: int) -> bytes:
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(16384):
+        body += chunk
+        if len(body) >= limit:
+            break
+    return bytes(body[:limit])
+
+
+class SharedResults:
+    """
+    Single-flight memo for coroutine results, bounded as an LRU. The first
+    caller for a key starts the computation as a task of its own; every
+    caller, earlier or later, awaits that task through a shield, so one
+    caller timing out does not cancel it for the others. Results rejected
+    by keep, and exceptions, are dropped once the task finishes so the next
+    caller retries.
+    """
+
+    def __init__(self, name: str, max_entries: int = 100000, keep: Callable[[Any], bool] = lambda result: True):
+        self.name = name
+        self.max_entries = max_entries
+        self.keep = keep
+        self.computed: Dict[str, int] = {}
+        self.reused: Dict[str, int] = {}
+        self._tasks: "OrderedDict[Hashable, asyncio.Future]" = OrderedDict()
+
+    def get(self, key: Hashable, compute: Callable[[], Awaitable], label: str = "") -> Awaitable:
+        task = self._tasks.get(key)
+        reused = task is not None
+        if reused:
+            self._tasks.move_to_end(key)
+        else:
+            task = asyncio.ensure_future(compute())
+            task.add_done_callback(partial(self._finished, key))
+            self._tasks[key] = task
+            while len(self._tasks) > self.max_entries:
+                self._tasks.popitem(last=False)
+        counts = self.reused if reused else self.computed
+        counts[label] = counts.get(label, 0) + 1
+        metrics.cache(self.name, reused)
+        return asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future) -> None:
+        # Also retrieves the exception, so an unawaited failure is not logged.
+        failed = task.cancelled() or task.exception() is not None
+        if (failed or not self.keep(task.result())) and self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for label in sorted(self.computed.keys() | self.reused.keys()):
+            computed, reused = self.computed.get(label, 0), self.reused.get(label, 0)
+            stats[label] = {
+                "lookups": computed + reused,
+                "computed": computed,
+                "ratio": (computed + reused) / computed if computed else 0.0,
+            }
+        return stats
+
+
+class FeatureEngine:
+    """
+    Extracts the same features as builder_csv.get_url_features on a single
+    event loop, with one aiohttp session, the shared async DNS cache and one
+    bounded executor shared by every URL of the run.
+    """
+
+    def __init__(
+        self,
+        max_urls: int = 100,
+        max_connections: int = 256,
+        blocking_workers: int = 8,
+        scheduler: Optional[Scheduler] = None,
+        timeouts: Optional[AdaptiveTimeouts] = None,
+        preflight: bool = False,
+        dedup: bool = False,
+        dedup_size: int = 100000,
+    ):
+        self.max_urls = max_urls
+        self.scheduler = scheduler or default_scheduler
+        self.max_connections = max_connections
+        self.blocking_workers = blocking_workers
+        self.timeouts = timeouts or default_timeouts
+        self.preflight = preflight
+        # Domain-scoped checks computed once per registered domain.
+        self.domain_results = (
+            SharedResults("domain_dedup", dedup_size, keep=lambda r: normalize_result(r) not in (-1, FEATURE_TIMEOUT))
+            if dedup
+            else None
+        )
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._async_checks = {
+            "safe_browsing": self._safe_browsing,
+            "listed_in_rbl": self._domain_in_rbl,
+            "ip_from_untrusted_country": self._ip_from_untrusted_country,
+            "indexed_by_google": self._indexed_by_google,
+        }
+
+    async def __aenter__(self) -> "FeatureEngine":
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        # A redirect starts the next hop: like requests' response.elapsed
+        # in the sync path, only the final hop is timed.
+        trace.on_request_redirect.append(self._on_request_start)
+        trace.on_request_end.append(self._on_request_end)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.scheduler.per_host,
+                ttl_dns_cache=300,
+            ),
+            trace_configs=[trace],
+            headers=HEADERS,
+            # Honour HTTP(S)_PROXY / NO_PROXY like the sync requests path does.
+            trust_env=True,
+        )
+        self.executor = ThreadPoolExecutor(max_workers=self.blocking_workers)
+        self._slots = asyncio.Semaphore(self.max_urls)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.session.close()
+        self.executor.shutdown(wait=True)
+
+    @staticmethod
+    async def _on_request_start(session, ctx, params) -> None:
+        if ctx.trace_request_ctx is not None:
+            ctx.trace_request_ctx.hop_start = asyncio.get_running_loop().time()
+
+    @staticmethod
+    async def _on_request_end(session, ctx, params) -> None:
+        if ctx.trace_request_ctx is not None:
+            hop = ctx.trace_request_ctx
+            hop.elapsed = asyncio.get_running_loop().time() - hop.hop_start
+
+    async def resolve_url(self, url: str, timeout: Optional[float] = None) -> URLContext:
+        if not url.startswith("http"):
+            url = "http://" + url
+        if timeout is None:
+            timeout = self.timeouts.get("fetch")
+        hop = SimpleNamespace(hop_start=None, elapsed=None)
+        host = parse_url(url).registered_domain
+        try:
+            async with self.scheduler.slot("target", host), self.session.get(
+                url,
+                ssl=False,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                trace_request_ctx=hop,
+            ) as response:
+                return URLContext(
+                    url=url,
+                    final_url=str(response.url),
+                    redirect_chain=[str(r.url) for r in response.history],
+                    status_code=response.status,
+                    headers=dict(response.headers),
+                    elapsed_ms=hop.elapsed * 1000 if hop.elapsed is not None else None,
+                )
+        except asyncio.TimeoutError as e:
+            print(f"[TIMEOUT] {url}: {e}")
+            metrics.failed(e)
+            error = e
+        except aiohttp.ClientConnectionError as e:
+            print(f"[CONNECTION ERROR] {url}: {e}")
+            metrics.failed(e)
+            error = e
+        except Exception as e:
+            print(f"[UNKNOWN ERROR] {url}: {e}")
+            metrics.failed(e)
+            error = e
+        return URLContext(url=url, final_url=url, error=str(error) or type(error).__name__)
+
+    async def _fetch(self, url: str, deadline: Optional[float]) -> URLContext:
+        with metrics.track("fetch") as call:
+            timeout = self.timeouts.budget("fetch", deadline)
+            try:
+                # Also bounds the wait for a scheduler slot, not just the request.
+                context = await asyncio.wait_for(self.resolve_url(url, timeout), timeout)
+            except asyncio.TimeoutError as e:
+                print(f"[TIMEOUT] {url}: deadline exceeded")
+                call.fail(e)
+                context = URLContext(url=url, final_url=url, error="deadline exceeded")
+            call.result = 0 if context.ok else -1
+        return context
+
+    async def _safe_browsing(self, url: str, context: URLContext):
+        return await check_safe_browsing_async(context.final_url)
+
+    async def _domain_in_rbl(self, url: str) -> int:
+        domain = parse_url(url).registered_domain
+        ip = await dns_cache.resolve_ip_async(domain)
+        return await dns_cache.rbl_listed_async(ip)
+
+    async def _ip_from_untrusted_country(
+        self, url: str, context: URLContext, untrusted_countries=("BR", "US", "CA")
+    ) -> int:
+        domain = parse_url(context.final_url).registered_domain
+        ip = await dns_cache.resolve_ip_async(domain)
+        if geoip.available:
+            country = geoip.country(ip)
+        else:
+            async with self.scheduler.slot("ipinfo"), self.session.get(
+                IPINFO_URL.format(ip=ip),
+                timeout=aiohttp.ClientTimeout(total=self.timeouts.get("ip_from_untrusted_country")),
+            ) as response:
+                body = await response.read()
+            metrics.transferred(len(body))
+            country = json.loads(body).get("country", "")
+        return 1 if country in untrusted_countries else 0
+
+    async def _indexed_by_google(self, url: str, context: URLContext) -> int:
+        domain = parse_url(context.final_url).registered_domain
+        async with self.scheduler.slot("google"), self.session.get(
+            GOOGLE_SEARCH_URL.format(domain=domain),
+            timeout=aiohttp.ClientTimeout(total=self.timeouts.get("indexed_by_google")),
+        ) as response:
+            body = await _read_capped(response, http_client.max_body)
+        metrics.transferred(len(body))
+        return 1 if "Not found result" not in body.decode(errors="replace") else 0
+
+    async def _call_check(self, name: str, url: str, kwargs: Dict):
+        if name in self._async_checks:
+            return await self._async_checks[name](url, **kwargs)
+        # Run in a copy of this task's context so cache hits in the worker
+        # thread are attributed to the check.
+        func = partial(contextvars.copy_context().run, FEATURE_CHECKS[name], url, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func)
+
+    def _shared_check(self, name: str, url: str, kwargs: Dict) -> Awaitable:
+        """
+        The check's result, shared by every URL on the same registered
+        domain when dedup is on. Checks on the fetched page key on the
+        final URL's domain, like the checks themselves.
+        """
+        if self.domain_results is None or name not in DOMAIN_CHECKS:
+            return self._call_check(name, url, kwargs)
+        domain = parse_url(kwargs["context"].final_url if name in CONTEXT_CHECKS else url).registered_domain
+        if not domain:
+            return self._call_check(name, url, kwargs)
+        return self.domain_results.get((name, domain), partial(self._call_check, name, url, kwargs), name)
+
+    async def _run_check(
+        self, name: str, url: str, context: Optional[Awaitable[URLContext]], deadline: Optional[float]
+    ):
+        try:
+            # Waiting for the shared fetch is not counted against the check.
+            kwargs = {"context": await context} if name in CONTEXT_CHECKS else {}
+            with metrics.track(name) as call:
+                if name in self._async_checks or name in BLOCKING_CHECKS:
+                    # A timed-out check is cancelled; one already running on
+                    # the executor finishes in the background and still
+                    # fills the caches.
+                    try:
+                        result = await asyncio.wait_for(
+                            self._shared_check(name, url, kwargs), self.timeouts.budget(name, deadline)
+                        )
+                    except asyncio.TimeoutError as e:
+                        call.fail(e)
+                else:
+                    result = FEATURE_CHECKS[name](url, **kwargs)
+                # Also covers timeouts a check caught itself and reported.
+                call.result = FEATURE_TIMEOUT if call.outcome == "timeout" else normalize_result(result)
+            return call.result
+        except Exception as e:
+            print(f"({name}) Error in {url}: {e}")
+            return -1
+
+    async def extract(self, url: str, names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Features of one URL, or only the given feature names. Every check
+        shares the URL's deadline (counted from when it gets a slot);
+        checks still pending when it expires are cancelled and reported as
+        FEATURE_TIMEOUT. With preflight on, URLs whose host is too dead to
+        pass is_valid_feature_set skip the network checks entirely. The
+        page is only fetched when a requested check needs it.
+        """
+        wanted = set(FEATURE_CHECKS if names is None else names)
+        names = [name for name in FEATURE_CHECKS if name in wanted]
+        if not names:
+            return {}
+        async with self._slots:
+            deadline = self.timeouts.deadline_at(time.monotonic())
+            network = any(name not in LEXICAL_FEATURES for name in names)
+            if network and self.preflight and not worth_checking(await preflight_async(url)):
+                print(f"[PREFLIGHT] {url}: host unreachable, network checks skipped")
+                features = short_circuit(url)
+                return {name: features[name] for name in names}
+            context = None
+            if any(name in CONTEXT_CHECKS for name in names):
+                context = asyncio.ensure_future(self._fetch(url, deadline))
+            try:
+                values = await asyncio.gather(
+                    *(self._run_check(name, url, context, deadline) for name in names)
+                )
+            finally:
+                if context is not None:
+                    context.cancel()
+            return dict(zip(names, values))
+
+    async def run(self, items: Iterable, handle: Callable[["FeatureEngine", object], Awaitable]) -> None:
+        """
+        Calls handle(engine, item) for every item with at most max_urls
+        running at once. Items are pulled lazily, so the input can be a
+        generator over a dataset of any size.
+        """
+        items = iter(items)
+
+        async def worker():
+            for item in items:
+                await handle(self, item)
+
+        await asyncio.gather(*(worker() for _ in range(self.max_urls)))
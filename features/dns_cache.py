@@ -0,0 +1,192 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import dns.asyncresolver
+import dns.resolver
+from dotenv import load_dotenv
+
+from features.wordlists import RBL_SERVERS
+from utils.metrics import metrics
+from utils.rate_limit import scheduler
+
+load_dotenv()
+
+# Answers that mean "this name does not exist" and are safe to cache.
+NEGATIVE_ERRORS = (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)
+
+
+class DNSCache:
+    """
+    Caching front for dnspython's sync and async resolvers. Positive answers
+    live for the record TTL (at least min_ttl); NXDOMAIN/NoAnswer live for
+    negative_ttl. Timeouts and server failures are never cached.
+    """
+
+    def __init__(
+        self,
+        nameservers: Optional[List[str]] = None,
+        max_entries: int = 100000,
+        min_ttl: float = 30,
+        negative_ttl: float = 300,
+        lifetime: float = 5,
+    ):
+        self.nameservers = nameservers
+        self.max_entries = max_entries
+        self.min_ttl = min_ttl
+        self.negative_ttl = negative_ttl
+        self.lifetime = lifetime
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._sync_resolver = self._configure(dns.resolver.Resolver())
+        self._async_resolver = self._configure(dns.asyncresolver.Resolver())
+        self._executor = ThreadPoolExecutor(max_workers=max(4, len(RBL_SERVERS) * 4))
+
+    @classmethod
+    def from_env(cls) -> "DNSCache":
+        nameservers = os.getenv("DNS_NAMESERVERS")
+        return cls(
+            nameservers=nameservers.split(",") if nameservers else None,
+            max_entries=int(os.getenv("DNS_CACHE_SIZE", 100000)),
+            negative_ttl=float(os.getenv("DNS_NEGATIVE_TTL", 300)),
+        )
+
+    def _configure(self, resolver):
+        resolver.lifetime = self.lifetime
+        if self.nameservers:
+            resolver.nameservers = [ns.split(":")[0] for ns in self.nameservers]
+            port = self.nameservers[0].partition(":")[2]
+            if port:
+                resolver.port = int(port)
+        return resolver
+
+    def _lookup(self, key: Tuple[str, str]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key: Tuple[str, str], ttl: float, answers, error) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, answers, error)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _unpack(entry) -> List[str]:
+        if entry[2] is not None:
+            raise entry[2]()
+        return entry[1]
+
+    def _remember_answer(self, key, answer) -> List[str]:
+        records = [rdata.to_text() for rdata in answer]
+        self._store(key, max(self.min_ttl, answer.rrset.ttl), records, None)
+        return records
+
+    def resolve(
+        self, name: str, rdtype: str = "A", service: Optional[str] = None, host: Optional[str] = None
+    ) -> List[str]:
+        key = (name.lower(), rdtype)
+        entry = self._lookup(key)
+        metrics.cache("dns_cache", entry is not None)
+        if entry is not None:
+            return self._unpack(entry)
+        try:
+            if service:
+                with scheduler.slot_sync(service, host):
+                    answer = self._sync_resolver.resolve(name, rdtype)
+            else:
+                answer = self._sync_resolver.resolve(name, rdtype)
+        except NEGATIVE_ERRORS as e:
+            self._store(key, self.negative_ttl, None, type(e))
+            raise
+        return self._remember_answer(key, answer)
+
+    async def _resolve_miss(self, key, service: Optional[str], host: Optional[str]):
+        name, rdtype = key
+        try:
+            if service:
+                async with scheduler.slot(service, host):
+                    answer = await self._async_resolver.resolve(name, rdtype)
+            else:
+                answer = await self._async_resolver.resolve(name, rdtype)
+        except NEGATIVE_ERRORS as e:
+            self._store(key, self.negative_ttl, None, type(e))
+            raise
+        return self._remember_answer(key, answer)
+
+    async def resolve_async(
+        self, name: str, rdtype: str = "A", service: Optional[str] = None, host: Optional[str] = None
+    ) -> List[str]:
+        key = (name.lower(), rdtype)
+        entry = self._lookup(key)
+        metrics.cache("dns_cache", entry is not None)
+        if entry is not None:
+            return self._unpack(entry)
+        # Concurrent misses for the same name share one query.
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._resolve_miss(key, service, host))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def resolve_ip(self, host: str) -> str:
+        return self.resolve(host, "A")[0]
+
+    async def resolve_ip_async(self, host: str) -> str:
+        return (await self.resolve_async(host, "A"))[0]
+
+    @staticmethod
+    def _rbl_verdict(outcomes) -> int:
+        errors = []
+        for outcome in outcomes:
+            if isinstance(outcome, NEGATIVE_ERRORS):
+                continue
+            if isinstance(outcome, Exception):
+                errors.append(outcome)
+                continue
+            return 1
+        if errors:
+            raise errors[0]
+        return 0
+
+    def _rbl_query(self, query: str, rbl: str):
+        try:
+            return self.resolve(query, "A", service="rbl", host=rbl)
+        except Exception as e:
+            return e
+
+    def rbl_listed(self, ip: str) -> int:
+        """
+        Queries every zone in RBL_SERVERS at once. Listed in any zone is 1,
+        NXDOMAIN everywhere is 0; otherwise the first lookup error is raised.
+        """
+        reversed_ip = ".".join(reversed(ip.split(".")))
+        queries = [f"{reversed_ip}.{rbl}" for rbl in RBL_SERVERS]
+        return self._rbl_verdict(self._executor.map(self._rbl_query, queries, RBL_SERVERS))
+
+    async def rbl_listed_async(self, ip: str) -> int:
+        reversed_ip = ".".join(reversed(ip.split(".")))
+        outcomes = await asyncio.gather(
+            *(
+                self.resolve_async(f"{reversed_ip}.{rbl}", "A", service="rbl", host=rbl)
+                for rbl in RBL_SERVERS
+            ),
+            return_exceptions=True,
+        )
+        return self._rbl_verdict(outcomes)
+
+
+dns_cache = DNSCache.from_env()
@@ -1,15 +1,18 @@
 from datetime import datetime, date
-import time
-from urllib.parse import parse_qs, urlparse
-import tldextract
-from typing import Tuple
-from features.validate import get_final_url
-from features.wordlists import PHISHING_PARAMS, RBL_SERVERS, SHORTENERS, SUSPICIOUS_WORD
+from typing import Optional, Tuple, Union
+from features.dns_cache import dns_cache
+from features.geoip import geoip
+from features.parsing import INVALID_PORT, parse_url
+from features.validate import URLContext, resolve_url
+from features.whois_cache import whois_cache
+from features.matcher import phishing_params, suspicious_words
+from features.wordlists import SHORTENERS
+from utils.http import GOOGLE_SEARCH_URL, IPINFO_URL, http_client
+from utils.metrics import metrics
+from utils.rate_limit import scheduler
 from utils.safe_browsing import check_safe_browsing
-import dns.resolver
+from utils.timeouts import timeouts
 import socket
-import whois
-import requests
 import ipaddress
 
 
@@ -18,87 +21,91 @@ def check_https(url: str) -> int:
 
 
 def check_short_domain(url: str, threshold: int = 3) -> int:
-    ext = tldextract.extract(url)
-    domain = ext.domain
+    domain = parse_url(url).domain
     return int(len(domain) <= threshold)
 
 
 def check_contains_suspicious_words(url: str) -> int:
-    return int(any(word in url.lower() for word in SUSPICIOUS_WORD))
+    return int(suspicious_words.contains(url))
 
 
-def check_safe_browsing_status(url: str) -> Tuple[bool, str]:
-    return check_safe_browsing(get_final_url(url))
+def _resolve(url: str, context: Optional[URLContext]) -> URLContext:
+    return context if context is not None else resolve_url(url)
 
 
-def check_has_many_redirects(url: str, threshold: int = 3) -> int:
+def check_safe_browsing_status(url: str, context: Optional[URLContext] = None) -> Union[Tuple[bool, str], int]:
+    return check_safe_browsing(_resolve(url, context).final_url)
+
+
+def check_has_many_redirects(url: str, threshold: int = 3, context: Optional[URLContext] = None) -> int:
     try:
-        final_url = get_final_url(url)
-        response = requests.get(final_url, allow_redirects=True, timeout=5)
-        redirects = len(response.history)
-        return 1 if redirects > threshold else 0
+        context = _resolve(url, context)
+        if not context.ok:
+            return -1
+        return 1 if context.redirects > threshold else 0
     except Exception as e:
         print(f"(check_has_many_redirects) Error in {url}: {e}")
+        metrics.failed(e)
         return -1
 
 
 def check_domain_in_rbl(url: str) -> int:
     try:
-        domain = tldextract.extract(url).registered_domain
-        ip = socket.gethostbyname(domain)
-        reversed_ip = ".".join(reversed(ip.split(".")))
-        for rbl in RBL_SERVERS:
-            query = f"{reversed_ip}.{rbl}"
-            try:
-                dns.resolver.resolve(query, "A")
-                return 1
-            except dns.resolver.NXDOMAIN:
-                continue
-        return 0
+        domain = parse_url(url).registered_domain
+        ip = dns_cache.resolve_ip(domain)
+        return dns_cache.rbl_listed(ip)
     except Exception as e:
         print(f"(check_domain_in_rbl) Error in {url}: {e}")
+        metrics.failed(e)
         return -1
 
 
-def check_ip_from_untrusted_country(url: str, untrusted_countries=["BR", "US", "CA"]) -> int:
+def check_ip_from_untrusted_country(
+    url: str, untrusted_countries=["BR", "US", "CA"], context: Optional[URLContext] = None
+) -> int:
     try:
-        final_url = get_final_url(url)
-        domain = tldextract.extract(final_url).registered_domain
-        ip = socket.gethostbyname(domain)
-        response = requests.get(f"https://ipinfo.io/{ip}/json", timeout=5)
-        country = response.json().get("country", "")
+        final_url = _resolve(url, context).final_url
+        domain = parse_url(final_url).registered_domain
+        ip = dns_cache.resolve_ip(domain)
+        if geoip.available:
+            country = geoip.country(ip)
+        else:
+            with scheduler.slot_sync("ipinfo"):
+                response = http_client.get(
+                    IPINFO_URL.format(ip=ip), timeout=timeouts.get("ip_from_untrusted_country")
+                )
+            metrics.transferred(len(response.content))
+            country = response.json().get("country", "")
         return 1 if country in untrusted_countries else 0
     except Exception as e:
         print(f"(check_ip_from_untrusted_country) Error in {url}: {e}")
+        metrics.failed(e)
         return -1
 
 
-def check_indexed_by_google(url: str) -> int:
+def check_indexed_by_google(url: str, context: Optional[URLContext] = None) -> int:
     try:
-        final_url = get_final_url(url)
-        domain = tldextract.extract(final_url).registered_domain
-        search_url = f"https://www.google.com/search?q=site:{domain}"
-        response = requests.get(search_url, timeout=5)
-        return 1 if "Not found result" not in response.text else 0
+        final_url = _resolve(url, context).final_url
+        domain = parse_url(final_url).registered_domain
+        search_url = GOOGLE_SEARCH_URL.format(domain=domain)
+        with scheduler.slot_sync("google"):
+            response, body = http_client.read_capped(search_url, timeouts.get("indexed_by_google"))
+        metrics.transferred(len(body))
+        return 1 if "Not found result" not in body.decode(errors="replace") else 0
     except Exception as e:
         print(f"(check_indexed_by_google) Error in {url}: {e}")
+        metrics.failed(e)
         return -1
 
 
-def check_has_low_domain_age(url: str, threshold_days: int = 180) -> int:
+def check_has_low_domain_age(
+    url: str, threshold_days: int = 180, context: Optional[URLContext] = None
+) -> int:
     try:
-        final_url = get_final_url(url)
-        domain = tldextract.extract(final_url).registered_domain
-        info = whois.whois(domain)
-        creation_date = (
-            info.creation_date
-            or info.get("created_date")
-            or info.get("created")
-            or None
-        )
-
-        if isinstance(creation_date, list):
-            creation_date = creation_date[0]
+        final_url = _resolve(url, context).final_url
+        domain = parse_url(final_url).registered_domain
+        creation_date = whois_cache.get(domain).creation_date
+
         if not isinstance(creation_date, (datetime, date)):
             print(f"(check_has_low_domain_age) Unexpected type: {type(creation_date)}")
             return -1
@@ -107,21 +114,22 @@ def check_has_low_domain_age(url: str, threshold_days: int = 180) -> int:
         return 1 if age_days < threshold_days else 0
     except (ConnectionError, socket.error) as e:
         print(f"(check_has_low_domain_age) Network error in {url}: {e}")
+        metrics.failed(e)
         return -1
     except Exception as e:
         print(f"(check_has_low_domain_age) Error in {url}: {e}")
+        metrics.failed(e)
         return -1
 
 
-def check_has_few_days_to_expire(url: str, threshold_days: int = 90) -> int:
+def check_has_few_days_to_expire(
+    url: str, threshold_days: int = 90, context: Optional[URLContext] = None
+) -> int:
     try:
-        final_url = get_final_url(url)
-        domain = tldextract.extract(final_url).registered_domain
-        info = whois.whois(domain)
-        expiration_date = info.expiration_date
+        final_url = _resolve(url, context).final_url
+        domain = parse_url(final_url).registered_domain
+        expiration_date = whois_cache.get(domain).expiration_date
 
-        if isinstance(expiration_date, list):
-            expiration_date = expiration_date[0]
         if not isinstance(expiration_date, (datetime, date)):
             print(f"(check_has_few_days_to_expire) Unexpected type: {type(expiration_date)}")
             return -1
@@ -130,15 +138,17 @@ def check_has_few_days_to_expire(url: str, threshold_days: int = 90) -> int:
         return 1 if remaining_days < threshold_days else 0
     except (ConnectionError, socket.error) as e:
         print(f"(check_has_few_days_to_expire) Network error in {url}: {e}")
+        metrics.failed(e)
         return -1
     except Exception as e:
         print(f"(check_has_few_days_to_expire) Error in {url}: {e}")
+        metrics.failed(e)
         return -1
 
 
 def check_domain_is_ip(url: str) -> int:
     try:
-        hostname = urlparse(url).hostname
+        hostname = parse_url(url).host
         ipaddress.ip_address(hostname)
         return 1
     except ValueError:
@@ -154,13 +164,13 @@ def check_double_slash_redirect(url: str) -> int:
 
 
 def check_hyphen_in_domain(url: str) -> int:
-    domain = tldextract.extract(url).domain
+    domain = parse_url(url).domain
     return int("-" in domain)
 
 
 def check_has_many_subdomains(url: str, threshold: int = 3) -> int:
     try:
-        subdomain = tldextract.extract(url).subdomain
+        subdomain = parse_url(url).subdomain
         count = len(subdomain.split(".")) if subdomain else 0
         return 1 if count > threshold else 0
     except Exception as e:
@@ -170,9 +180,7 @@ def check_has_many_subdomains(url: str, threshold: int = 3) -> int:
 
 def check_has_many_query_params(url: str, threshold: int = 5) -> int:
     try:
-        parsed = urlparse(url)
-        query_params = parse_qs(parsed.query)
-        count = len(query_params)
+        count = len(parse_url(url).query)
         return 1 if count > threshold else 0
     except Exception as e:
         print(f"(check_has_many_query_params) Error in {url}: {e}")
@@ -181,12 +189,7 @@ def check_has_many_query_params(url: str, threshold: int = 5) -> int:
 
 def check_phishing_query_params(url: str) -> int:
     try:
-        parsed = urlparse(url)
-        query_params = parse_qs(parsed.query)
-        for param in PHISHING_PARAMS:
-            if param in query_params:
-                return 1
-        return 0
+        return int(phishing_params.contains_any(parse_url(url).query))
     except Exception as e:
         print(f"(check_phishing_query_params) Error in {url}: {e}")
         return -1
@@ -194,9 +197,11 @@ def check_phishing_query_params(url: str) -> int:
 
 def check_nonstandard_port(url: str) -> int:
     try:
-        parsed = urlparse(url)
+        parsed = parse_url(url)
         port = parsed.port
-        scheme = parsed.scheme.lower()
+        scheme = parsed.scheme
+        if port == INVALID_PORT:
+            raise ValueError(f"invalid port in {url}")
         if not port:
             return 0
         if (scheme == "http" and port != 80) or (scheme == "https" and port != 443):
@@ -209,21 +214,22 @@ def check_nonstandard_port(url: str) -> int:
 
 def check_url_shortener(url: str) -> int:
     try:
-        domain = tldextract.extract(url).registered_domain.lower()
+        domain = parse_url(url).registered_domain.lower()
         return 1 if domain in SHORTENERS else 0
     except Exception as e:
         print(f"(check_url_shortenet) Error in {url}: {e}")
         return -1
 
 
-def check_has_high_response_time(url: str, threshold_ms: int = 1000) -> int:
+def check_has_high_response_time(
+    url: str, threshold_ms: int = 1000, context: Optional[URLContext] = None
+) -> int:
     try:
-        final_url = get_final_url(url)
-        start = time.time()
-        response = requests.get(final_url, timeout=10, verify=False)
-        elapsed = (time.time() - start) * 1000 
-
-        return 1 if elapsed > threshold_ms else 0
+        context = _resolve(url, context)
+        if not context.ok:
+            return -1
+        return 1 if context.elapsed_ms > threshold_ms else 0
     except Exception as e:
         print(f"(check_has_high_response_time) Error in {url}: {e}")
+        metrics.failed(e)
         return -1
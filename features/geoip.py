@@ -0,0 +1,60 @@
+import ipaddress
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import geoip2.database
+import geoip2.errors
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class GeoIPLookup:
+    """
+    IP -> ISO country code from a local MaxMind-format database (Country or
+    City edition), opened memory-mapped and fronted by an in-process cache.
+    Private, loopback and other non-global addresses have no country and
+    are answered without a lookup.
+    """
+
+    def __init__(self, path: Optional[str], cache_size: int = 100000):
+        self.path = path
+        self._reader = None
+        self._lock = threading.Lock()
+        self.country = lru_cache(maxsize=cache_size)(self._country)
+
+    @classmethod
+    def from_env(cls) -> "GeoIPLookup":
+        return cls(
+            path=os.getenv("GEOIP_DB_PATH") or None,
+            cache_size=int(os.getenv("GEOIP_CACHE_SIZE", 100000)),
+        )
+
+    @property
+    def available(self) -> bool:
+        """False without a database file, so callers fall back to ipinfo.io."""
+        return bool(self.path) and os.path.exists(self.path)
+
+    def _open(self) -> geoip2.database.Reader:
+        with self._lock:
+            if self._reader is None:
+                self._reader = geoip2.database.Reader(self.path, mode=geoip2.database.MODE_MMAP)
+            return self._reader
+
+    def _country(self, ip: str) -> str:
+        if not ipaddress.ip_address(ip).is_global:
+            return ""
+        reader = self._open()
+        try:
+            if "City" in reader.metadata().database_type:
+                response = reader.city(ip)
+            else:
+                response = reader.country(ip)
+        except geoip2.errors.AddressNotFoundError:
+            return ""
+        return response.country.iso_code or ""
+
+
+geoip = GeoIPLookup.from_env()
@@ -0,0 +1,83 @@
+import ipaddress
+from typing import Iterable, Union
+
+import pandas as pd
+
+from features.matcher import phishing_params, suspicious_words
+from features.names import LEXICAL_FEATURES
+from features.parsing import INVALID_PORT, ParsedURL, parse_url
+from features.wordlists import SHORTENERS
+
+# Columns computed per URL from its memoised ParsedURL, see _parsed_features.
+_PARSED_FEATURES = [
+    "short_domain",
+    "is_ip_domain",
+    "has_hyphen",
+    "subdomain_count",
+    "query_params_count",
+    "has_phishing_query_params",
+    "nonstandard_port",
+    "url_shortener",
+]
+
+
+def _is_ip(hostname) -> int:
+    try:
+        ipaddress.ip_address(hostname)
+        return 1
+    except ValueError:
+        return 0
+
+
+def _nonstandard_port(parsed: ParsedURL) -> int:
+    port = parsed.port
+    if port == INVALID_PORT:
+        return -1
+    if not port:
+        return 0
+    scheme = parsed.scheme
+    return int((scheme == "http" and port != 80) or (scheme == "https" and port != 443))
+
+
+def _parsed_features(url: str, short_threshold: int = 3, subdomain_threshold: int = 3,
+                     query_threshold: int = 5) -> tuple:
+    parsed = parse_url(url)
+    subdomains = len(parsed.subdomain.split(".")) if parsed.subdomain else 0
+    return (
+        int(len(parsed.domain) <= short_threshold),
+        _is_ip(parsed.host),
+        int("-" in parsed.domain),
+        int(subdomains > subdomain_threshold),
+        int(len(parsed.query) > query_threshold),
+        int(phishing_params.contains_any(parsed.query)),
+        _nonstandard_port(parsed),
+        int(parsed.registered_domain.lower() in SHORTENERS),
+    )
+
+
+def extract_lexical(urls: Union[pd.Series, Iterable[str]]) -> pd.DataFrame:
+    """
+    Lexical features for a column of URLs, one int8 column per feature in
+    LEXICAL_FEATURES order. Values match the single-URL checks in
+    features.features; no network access is made.
+    """
+    if not isinstance(urls, pd.Series):
+        urls = pd.Series(list(urls), dtype="object")
+    urls = urls.astype(str)
+    lower = urls.str.lower()
+
+    features = pd.DataFrame(index=urls.index)
+    features["uses_https"] = lower.str.startswith("https://")
+    features["has_suspicious_words"] = lower.map(suspicious_words.contains)
+    features["has_at_symbol"] = urls.str.contains("@", regex=False)
+    features["has_double_slash"] = urls.str.replace("://", "", n=1, regex=False).str.contains(
+        "//", regex=False
+    )
+
+    parsed = pd.DataFrame(
+        [_parsed_features(url) for url in urls],
+        index=urls.index,
+        columns=_PARSED_FEATURES,
+    )
+    features = features.join(parsed)
+    return features[LEXICAL_FEATURES].astype("int8")
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+from features.wordlists import PHISHING_PARAMS, SUSPICIOUS_WORD
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+load_dotenv()
+
+def load_wordlist(path: str) -> List[str]:
+    """One term per line; blank lines and lines starting with # are ignored."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def _build_automaton(words: Iterable[str]):
+    goto: List[Dict[str, int]] = [{}]
+    fail = [0]
+    out: List[List[str]] = [[]]
+    for word in words:
+        node = 0
+        for ch in word:
+            nxt = goto[node].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[node][ch] = nxt
+                goto.append({})
+                fail.append(0)
+                out.append([])
+            node = nxt
+        out[node].append(word)
+
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for ch, nxt in goto[node].items():
+            queue.append(nxt)
+            f = fail[node]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(ch, 0)
+            out[nxt] = out[nxt] + out[fail[nxt]]
+    return goto, fail, out
+
+
+def _first(automaton, text: str) -> bool:
+    """True at the first position where any term ends."""
+    goto, fail, out = automaton
+    node = 0
+    for ch in text:
+        while node and ch not in goto[node]:
+            node = fail[node]
+        node = goto[node].get(ch, 0)
+        if out[node]:
+            return True
+    return False
+
+
+def _scan(automaton, text: str) -> Dict[str, int]:
+    goto, fail, out = automaton
+    hits: Dict[str, int] = {}
+    node = 0
+    for ch in text:
+        while node and ch not in goto[node]:
+            node = fail[node]
+        node = goto[node].get(ch, 0)
+        for word in out[node]:
+            hits[word] = hits.get(word, 0) + 1
+    return hits
+
+
+class PatternMatcher:
+    """
+    Case-insensitive multi-term matcher compiled once and reused for every
+    URL. contains() and matches() walk one Aho-Corasick automaton
+    (pyahocorasick when installed), so a pass costs the same whatever the
+    number of terms; matches() returns the overlapping hit count of every
+    term. When built with a path, the file's terms are added to the
+    built-in ones and reloaded when it changes; a missing file just
+    contributes no terms.
+    """
+
+    def __init__(self, words: Iterable[str], path: Optional[str] = None, check_interval: float = 30):
+        self.builtin = list(words)
+        self.path = path
+        self.check_interval = check_interval
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._compile(self._load_terms())
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return None
+
+    def _load_terms(self) -> List[str]:
+        terms = list(self.builtin)
+        if self.path:
+            self._mtime = self._file_mtime()
+            try:
+                terms.extend(load_wordlist(self.path))
+            except FileNotFoundError:
+                self._mtime = None
+        return terms
+
+    def _compile(self, terms: Iterable[str]) -> None:
+        words = frozenset(term.lower() for term in terms if term)
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for word in words:
+                automaton.add_word(word, word)
+            if words:
+                automaton.make_automaton()
+        else:
+            automaton = _build_automaton(words)
+        # Swapped as a single tuple so readers never see a half-built state.
+        self._state = (words, automaton)
+
+    @property
+    def words(self) -> frozenset:
+        self._maybe_reload()
+        return self._state[0]
+
+    def reload(self) -> bool:
+        """Rebuilds from the file if its mtime changed. Returns True if it did."""
+        if not self.path:
+            return False
+        with self._lock:
+            if self._file_mtime() == self._mtime:
+                return False
+            self._compile(self._load_terms())
+            return True
+
+    def _maybe_reload(self) -> None:
+        if self.path and time.monotonic() - self._checked >= self.check_interval:
+            self._checked = time.monotonic()
+            self.reload()
+
+    def contains(self, text: str) -> bool:
+        """True if any term occurs in text; stops at the first hit."""
+        self._maybe_reload()
+        words, automaton = self._state
+        if not words:
+            return False
+        text = text.lower()
+        if ahocorasick is None:
+            return _first(automaton, text)
+        return next(automaton.iter(text), None) is not None
+
+    def contains_any(self, terms: Iterable[str]) -> bool:
+        """True if any of terms (compared lowercased) is itself in the list, e.g. a query key."""
+        words = self.words
+        return any(term.lower() in words for term in terms)
+
+    def matches(self, text: str) -> Dict[str, int]:
+        self._maybe_reload()
+        words, automaton = self._state
+        text = text.lower()
+        if ahocorasick is None:
+            return _scan(automaton, text)
+        hits: Dict[str, int] = {}
+        if words:
+            for _, word in automaton.iter(text):
+                hits[word] = hits.get(word, 0) + 1
+        return hits
+
+
+suspicious_words = PatternMatcher(SUSPICIOUS_WORD, path=os.getenv("SUSPICIOUS_WORDS_FILE") or None)
+phishing_params = PatternMatcher(PHISHING_PARAMS, path=os.getenv("PHISHING_PARAMS_FILE") or None)
@@ -0,0 +1,41 @@
+# Column order of the feature dataset. builder_csv.FEATURE_CHECKS lists its
+# checks in this order; modules that only need the names (loading datasets,
+# scoring) import them from here without pulling in the network checks.
+FEATURE_NAMES = [
+    "uses_https",
+    "short_domain",
+    "has_suspicious_words",
+    "safe_browsing",
+    "has_many_redirects",
+    "listed_in_rbl",
+    "ip_from_untrusted_country",
+    "indexed_by_google",
+    "has_low_domain_age",
+    "has_few_days_to_expire",
+    "is_ip_domain",
+    "has_at_symbol",
+    "has_double_slash",
+    "has_hyphen",
+    "subdomain_count",
+    "query_params_count",
+    "has_phishing_query_params",
+    "nonstandard_port",
+    "url_shortener",
+    "has_high_response_time",
+]
+
+# Features that only look at the URL string, in FEATURE_NAMES order.
+LEXICAL_FEATURES = [
+    "uses_https",
+    "short_domain",
+    "has_suspicious_words",
+    "is_ip_domain",
+    "has_at_symbol",
+    "has_double_slash",
+    "has_hyphen",
+    "subdomain_count",
+    "query_params_count",
+    "has_phishing_query_params",
+    "nonstandard_port",
+    "url_shortener",
+]
@@ -0,0 +1,91 @@
+import os
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+import tldextract
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Port value used when the URL carries a port that urlparse rejects.
+INVALID_PORT = -1
+
+
+def _offline_extractor() -> tldextract.TLDExtract:
+    # Never fetch the public suffix list: use TLDEXTRACT_SUFFIX_FILE when set
+    # (a locally cached copy), otherwise the snapshot bundled with tldextract.
+    suffix_file = os.getenv("TLDEXTRACT_SUFFIX_FILE")
+    return tldextract.TLDExtract(
+        suffix_list_urls=(f"file://{os.path.abspath(suffix_file)}",) if suffix_file else (),
+        cache_dir=None,
+        fallback_to_snapshot=True,
+    )
+
+
+_extract = _offline_extractor()
+
+
+class ParsedURL(NamedTuple):
+    url: str
+    scheme: str
+    host: Optional[str]
+    port: Optional[int]
+    path: str
+    subdomain: str
+    domain: str
+    suffix: str
+    registered_domain: str
+    query: Dict[str, List[str]]
+
+
+@lru_cache(maxsize=int(os.getenv("HOST_SPLIT_CACHE_SIZE", 65536)))
+def split_host(url_or_netloc: str) -> tldextract.tldextract.ExtractResult:
+    return _extract(url_or_netloc)
+
+
+@lru_cache(maxsize=int(os.getenv("URL_PARSE_CACHE_SIZE", 65536)))
+def parse_url(url: str) -> ParsedURL:
+    """
+    Parses a URL once for every check. Results are memoised and shared, so
+    callers must not mutate the query dict.
+    """
+    parsed = urlparse(url)
+    try:
+        port = parsed.port
+    except ValueError:
+        port = INVALID_PORT
+    # tldextract only looks at the host part, so URLs sharing a netloc share
+    # one cached split. Scheme-less URLs keep the whole string as the key.
+    ext = split_host(f"{parsed.scheme}://{parsed.netloc}" if parsed.netloc else url)
+    return ParsedURL(
+        url=url,
+        scheme=parsed.scheme.lower(),
+        host=parsed.hostname,
+        port=port,
+        path=parsed.path,
+        subdomain=ext.subdomain,
+        domain=ext.domain,
+        suffix=ext.suffix,
+        registered_domain=ext.registered_domain,
+        query=parse_qs(parsed.query),
+    )
+
+
+def normalize_url(url):
+    """
+    Key under which spellings of one URL share their features: only the
+    case of the scheme and host is folded, since no feature depends on it.
+    Everything else, surrounding whitespace included, is kept as is: it can
+    change a lexical check (" https://x" does not use https). Values that
+    are not strings (an empty CSV cell) are returned unchanged.
+    """
+    if not isinstance(url, str):
+        return url
+    parsed = urlparse(url)
+    # urlparse already lowercases the scheme, but not the netloc.
+    prefix = f"{parsed.scheme}://{parsed.netloc}"
+    if not parsed.netloc or url[: len(prefix)].lower() != prefix.lower():
+        return url
+    userinfo, at, host = parsed.netloc.rpartition("@")
+    return f"{parsed.scheme}://{userinfo}{at}{host.lower()}{url[len(prefix):]}"
@@ -0,0 +1,142 @@
+import asyncio
+import ipaddress
+import os
+import socket
+import urllib.request
+from dataclasses import dataclass
+from typing import Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from features.dns_cache import NEGATIVE_ERRORS, dns_cache
+from features.parsing import INVALID_PORT, parse_url
+from utils.metrics import metrics
+
+load_dotenv()
+
+PREFLIGHT_TIMEOUT = float(os.getenv("PREFLIGHT_TIMEOUT", 3))
+
+# Features that cannot succeed when the registered domain has no address
+# (RBL and GeoIP look up its IP) or when the URL's host cannot be reached
+# (they read the fetched page).
+NEEDS_DOMAIN_IP = {"listed_in_rbl", "ip_from_untrusted_country"}
+NEEDS_TARGET = {"has_many_redirects", "has_high_response_time"}
+
+
+@dataclass
+class Preflight:
+    """
+    One DNS resolution and one TCP connect for a URL, before its checks
+    run. Behind a proxy only the domain is resolved (RBL and GeoIP still
+    look it up locally); the host is left to the proxy.
+    """
+
+    url: str
+    domain_resolves: bool
+    host_resolves: bool
+    reachable: bool
+
+    @property
+    def lost_features(self) -> Set[str]:
+        lost = set()
+        if not self.domain_resolves:
+            lost |= NEEDS_DOMAIN_IP
+        if not (self.host_resolves and self.reachable):
+            lost |= NEEDS_TARGET
+        return lost
+
+
+def _target(url: str) -> Tuple[str, str, int, bool]:
+    if not url.startswith("http"):
+        url = "http://" + url
+    parsed = parse_url(url)
+    port = parsed.port
+    if not port or port == INVALID_PORT:
+        port = 443 if parsed.scheme == "https" else 80
+    host = parsed.host or ""
+    return parsed.registered_domain, host, port, _proxied(parsed.scheme or "http", host)
+
+
+def _proxied(scheme: str, host: str) -> bool:
+    """
+    Whether the fetch goes through an HTTP(S)_PROXY for this host. The
+    proxy resolves and connects to the host, so neither a local DNS answer
+    nor a direct connect says whether the fetch will work.
+    """
+    proxies = urllib.request.getproxies()
+    return bool(host) and scheme in proxies and not urllib.request.proxy_bypass(host)
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _resolve(name: str) -> Optional[str]:
+    """
+    IP of name, None if DNS says it does not exist. Other DNS failures
+    (timeouts, SERVFAIL) are not proof of a dead host and return "".
+    """
+    if not name:
+        return None
+    if _is_ip(name):
+        return name
+    try:
+        return dns_cache.resolve_ip(name)
+    except NEGATIVE_ERRORS:
+        return None
+    except Exception:
+        return ""
+
+
+async def _resolve_async(name: str) -> Optional[str]:
+    if not name:
+        return None
+    if _is_ip(name):
+        return name
+    try:
+        return await dns_cache.resolve_ip_async(name)
+    except NEGATIVE_ERRORS:
+        return None
+    except Exception:
+        return ""
+
+
+def preflight(url: str, timeout: float = PREFLIGHT_TIMEOUT) -> Preflight:
+    with metrics.track("preflight") as call:
+        domain, host, port, proxied = _target(url)
+        domain_ip = _resolve(domain)
+        host_ip = "" if proxied else (domain_ip if host == domain else _resolve(host))
+        # An inconclusive DNS answer, or a proxy in the way, gives the fetch
+        # the benefit of the doubt.
+        reachable = host_ip == ""
+        if host_ip:
+            try:
+                socket.create_connection((host_ip, port), timeout=timeout).close()
+                reachable = True
+            except OSError:
+                pass
+        call.result = 0
+    return Preflight(url, domain_ip is not None, host_ip is not None, reachable)
+
+
+async def preflight_async(url: str, timeout: float = PREFLIGHT_TIMEOUT) -> Preflight:
+    with metrics.track("preflight") as call:
+        domain, host, port, proxied = _target(url)
+        domain_ip = await _resolve_async(domain)
+        host_ip = "" if proxied else (domain_ip if host == domain else await _resolve_async(host))
+        # An inconclusive DNS answer, or a proxy in the way, gives the fetch
+        # the benefit of the doubt.
+        reachable = host_ip == ""
+        if host_ip:
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(host_ip, port), timeout)
+                writer.close()
+                reachable = True
+            except (OSError, asyncio.TimeoutError):
+                pass
+        call.result = 0
+    return Preflight(url, domain_ip is not None, host_ip is not None, reachable)
@@ -0,0 +1,127 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+from dotenv import load_dotenv
+
+from features.names import FEATURE_NAMES, LEXICAL_FEATURES
+from utils.metrics import metrics
+from utils.timeouts import FEATURE_TIMEOUT
+
+load_dotenv()
+
+DAY = 24 * 3600
+
+# How long a stored value stays fresh, in seconds. Lexical features only
+# depend on the URL string and never expire. Overridable with
+# FEATURE_TTL_<NAME> (seconds, or "inf").
+FEATURE_TTLS = {
+    **dict.fromkeys(LEXICAL_FEATURES, math.inf),
+    "safe_browsing": DAY,
+    "listed_in_rbl": DAY,
+    "has_few_days_to_expire": DAY,
+    "has_low_domain_age": 7 * DAY,
+    "ip_from_untrusted_country": 7 * DAY,
+    "indexed_by_google": 7 * DAY,
+    "has_many_redirects": 7 * DAY,
+    "has_high_response_time": 7 * DAY,
+}
+
+# Bump a feature's version when its check changes meaning (new threshold,
+# new wordlist, ...): stored values with another version count as missing.
+FEATURE_VERSIONS = dict.fromkeys(FEATURE_NAMES, 1)
+
+# Errors and timeouts are never stored, so the check is retried next run.
+UNSTORED = (-1, FEATURE_TIMEOUT, None)
+
+
+class FeatureStore:
+    """
+    Feature values keyed by (url, feature) in SQLite, with the time they
+    were computed and the version of the check that computed them. A run
+    asks for the fresh values of a URL, computes only the rest and puts
+    them back. Each put is its own short transaction, so shard processes
+    sharing the file never wait long for the write lock; a store that stays
+    locked or fails anyway only costs the cache, never the run.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttls: Optional[Mapping[str, float]] = None,
+        versions: Optional[Mapping[str, int]] = None,
+    ):
+        self.path = path
+        self.ttls = dict(FEATURE_TTLS if ttls is None else ttls)
+        self.versions = dict(FEATURE_VERSIONS if versions is None else versions)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @classmethod
+    def from_env(cls) -> "FeatureStore":
+        ttls = {}
+        for name, default in FEATURE_TTLS.items():
+            value = os.getenv(f"FEATURE_TTL_{name.upper()}")
+            ttls[name] = float(value) if value else default
+        return cls(path=os.getenv("FEATURE_STORE_PATH", ".cache/features.sqlite"), ttls=ttls)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Shard processes share one store; a writer holds the lock for a
+            # single put, so a short wait is enough before giving up on it.
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS features ("
+                "url TEXT, feature TEXT, value INTEGER, computed_at REAL, version INTEGER, "
+                "PRIMARY KEY (url, feature)) WITHOUT ROWID"
+            )
+            self._db.commit()
+        return self._db
+
+    def fresh(self, url: str, now: Optional[float] = None) -> Dict[str, int]:
+        """Stored values of url that are neither expired nor from another check version."""
+        now = time.time() if now is None else now
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT feature, value, computed_at, version FROM features WHERE url = ?", (url,)
+                ).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"[STORE] Falha ao ler {url}: {e}")
+            rows = []
+        values = {
+            feature: value
+            for feature, value, computed_at, version in rows
+            if version == self.versions.get(feature) and now - computed_at < self.ttls.get(feature, 0)
+        }
+        for name in FEATURE_NAMES:
+            metrics.cache("feature_store", name in values)
+        return values
+
+    def put(self, url: str, features: Mapping[str, int], now: Optional[float] = None) -> None:
+        """Stores the successful values among features; errors and timeouts are left out."""
+        now = time.time() if now is None else now
+        rows = [
+            (url, name, int(value), now, self.versions[name])
+            for name, value in features.items()
+            if name in self.versions and value not in UNSTORED
+        ]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                db = self._connect()
+                # Commits on success and rolls back on error, releasing the write lock either way.
+                with db:
+                    db.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?)", rows)
+        except sqlite3.OperationalError as e:
+            print(f"[STORE] Valores de {url} não armazenados: {e}")
+
+
+feature_store = FeatureStore.from_env()
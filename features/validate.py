@@ -1,22 +1,73 @@
 import requests
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-    "Accept-Language": "en-US,en;q=0.9"
-}
+from features.parsing import parse_url
+from utils.http import http_client
+from utils.metrics import metrics
+from utils.rate_limit import scheduler
+from utils.timeouts import timeouts
 
-def get_final_url(url: str) -> str:
+
+@dataclass
+class URLContext:
+    """Result of fetching a URL once, shared by every check of that URL."""
+
+    url: str
+    final_url: str
+    redirect_chain: List[str] = field(default_factory=list)
+    status_code: Optional[int] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    elapsed_ms: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def redirects(self) -> int:
+        return len(self.redirect_chain)
+
+
+def resolve_url(url: str, timeout: Optional[float] = None) -> URLContext:
+    if not url.startswith("http"):
+        url = "http://" + url
+    if timeout is None:
+        timeout = timeouts.get("fetch")
     try:
-        if not url.startswith("http"):
-            url = "http://" + url
-        response = requests.get(url, headers=headers, timeout=10, verify=False)
-        return response.url
+        with scheduler.slot_sync("target", parse_url(url).registered_domain):
+            # Only the status, headers and redirect chain are used: the body
+            # is never downloaded.
+            response, body = http_client.fetch(url, timeout)
+        metrics.transferred(len(body))
+        return URLContext(
+            url=url,
+            final_url=response.url,
+            redirect_chain=[r.url for r in response.history],
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            # Time until the final hop's headers arrived, redirects excluded.
+            elapsed_ms=response.elapsed.total_seconds() * 1000,
+        )
     except requests.exceptions.SSLError as e:
         print(f"[SSL ERROR] {url}: {e}")
+        metrics.failed(e)
+        error = e
     except requests.exceptions.ConnectionError as e:
         print(f"[CONNECTION ERROR] {url}: {e}")
+        metrics.failed(e)
+        error = e
     except requests.exceptions.Timeout as e:
         print(f"[TIMEOUT] {url}: {e}")
+        metrics.failed(e)
+        error = e
     except Exception as e:
         print(f"[UNKNOWN ERROR] {url}: {e}")
-    return url
\ No newline at end of file
+        metrics.failed(e)
+        error = e
+    return URLContext(url=url, final_url=url, error=str(error))
+
+
+def get_final_url(url: str) -> str:
+    return resolve_url(url).final_url
@@ -0,0 +1,176 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Dict, Optional
+
+import whois
+from dotenv import load_dotenv
+
+from utils.metrics import metrics
+from utils.rate_limit import scheduler
+
+load_dotenv()
+
+
+@dataclass
+class WhoisRecord:
+    creation_date: Optional[datetime]
+    expiration_date: Optional[datetime]
+
+
+def _first_date(value) -> Optional[datetime]:
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return None
+
+
+def record_from_whois(info) -> WhoisRecord:
+    creation_date = (
+        info.creation_date
+        or info.get("created_date")
+        or info.get("created")
+        or None
+    )
+    return WhoisRecord(
+        creation_date=_first_date(creation_date),
+        expiration_date=_first_date(info.expiration_date),
+    )
+
+
+def _to_text(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _from_text(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+class WhoisCache:
+    """
+    WHOIS records keyed by registered domain. Lookups go through an
+    in-memory LRU first, then a SQLite file that survives restarts, and only
+    then to the WHOIS servers. Concurrent misses on the same domain share a
+    single query. Replies without any date (rate-limit notices such as
+    "Queried interval is too short", or registries that publish none) are
+    kept for negative_ttl only, so one throttled reply does not blank a
+    domain for the whole TTL.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 50000,
+        lookup: Callable[[str], object] = whois.whois,
+        negative_ttl: float = 3600,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = min(negative_ttl, ttl)
+        self.max_entries = max_entries
+        self.lookup = lookup
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Lock] = {}
+        self._db: Optional[sqlite3.Connection] = None
+
+    @classmethod
+    def from_env(cls) -> "WhoisCache":
+        return cls(
+            path=os.getenv("WHOIS_CACHE_PATH", ".cache/whois.sqlite"),
+            ttl=float(os.getenv("WHOIS_CACHE_TTL", 7 * 24 * 3600)),
+            negative_ttl=float(os.getenv("WHOIS_CACHE_NEGATIVE_TTL", 3600)),
+            max_entries=int(os.getenv("WHOIS_CACHE_SIZE", 50000)),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # The timeout lets several shard processes share one cache file.
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS whois ("
+                "domain TEXT PRIMARY KEY, creation_date TEXT, "
+                "expiration_date TEXT, fetched_at REAL)"
+            )
+            self._db.execute("DELETE FROM whois WHERE fetched_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+        return self._db
+
+    def _ttl_for(self, record: WhoisRecord) -> float:
+        if record.creation_date is None and record.expiration_date is None:
+            return self.negative_ttl
+        return self.ttl
+
+    def _remember(self, domain: str, fetched_at: float, record: WhoisRecord) -> None:
+        self._memory[domain] = (fetched_at, record)
+        self._memory.move_to_end(domain)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _cached(self, domain: str) -> Optional[WhoisRecord]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(domain)
+            if entry is not None:
+                if now - entry[0] < self._ttl_for(entry[1]):
+                    self._memory.move_to_end(domain)
+                    return entry[1]
+                del self._memory[domain]
+
+            row = self._connect().execute(
+                "SELECT creation_date, expiration_date, fetched_at FROM whois WHERE domain = ?",
+                (domain,),
+            ).fetchone()
+            if row is None:
+                return None
+            record = WhoisRecord(_from_text(row[0]), _from_text(row[1]))
+            if now - row[2] >= self._ttl_for(record):
+                return None
+            self._remember(domain, row[2], record)
+            return record
+
+    def _store(self, domain: str, record: WhoisRecord) -> None:
+        fetched_at = time.time()
+        with self._lock:
+            self._remember(domain, fetched_at, record)
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO whois VALUES (?, ?, ?, ?)",
+                (domain, _to_text(record.creation_date), _to_text(record.expiration_date), fetched_at),
+            )
+            db.commit()
+
+    def get(self, domain: str) -> WhoisRecord:
+        record = self._cached(domain)
+        metrics.cache("whois_cache", record is not None)
+        if record is not None:
+            return record
+
+        with self._lock:
+            domain_lock = self._inflight.setdefault(domain, threading.Lock())
+        try:
+            with domain_lock:
+                record = self._cached(domain)
+                if record is not None:
+                    return record
+                suffix = domain.split(".", 1)[-1]
+                with scheduler.slot_sync("whois", suffix):
+                    record = record_from_whois(self.lookup(domain))
+                self._store(domain, record)
+                return record
+        finally:
+            with self._lock:
+                self._inflight.pop(domain, None)
+
+
+whois_cache = WhoisCache.from_env()
@@ -36,7 +36,7 @@ SUSPICIOUS_WORD = [
 
 PHISHING_PARAMS = ["token", "session", "auth", "password", "login", "verify"]
 
-SHORTENERS = [
+SHORTENERS = frozenset([
     "bit.ly",
     "tinyurl.com",
     "goo.gl",
@@ -45,4 +45,4 @@ SHORTENERS = [
     "is.gd",
     "buff.ly",
     "adf.ly",
-]
\ No newline at end of file
+])
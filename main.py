@@ -1,55 +1,112 @@
-import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict
-
-from builder_csv import get_url_features
-
-def binary_label(label: str) -> int:
-    return 0 if label.lower() == "good" else 1
-
-
-def is_valid_feature_set(features: Dict, threshold: float = 0.7) -> bool:
-    required_keys = [
-        "has_few_days_to_expire",
-        "has_low_domain_age",
-        "ip_from_untrusted_country",
-        "has_many_redirects",
-        "has_high_response_time",
-        "listed_in_rbl"
-    ]
-    
-    selected = {k: features.get(k, -1) for k in required_keys}
-    total = len(selected)
-    valid = sum(1 for v in selected.values() if v != -1 and v is not None)
-    
-    return (valid / total) >= threshold if total > 0 else False
-
-
-df = pd.read_csv("datasets/url_with_result.csv")
-
-
-def process_row(row) -> Dict:
-    url = row["url"]
-    label_str = row["type"]
-    label = binary_label(label_str)
-    features = get_url_features(url)
-
-    if not is_valid_feature_set(features):
-        print(f"[SKIPPED] {url} removida por baixa qualidade de features.")
-        return None
-
-    features["url"] = url
-    features["label"] = label
-    return features
-
-
-
-with ThreadPoolExecutor() as executor:
-    results = list(executor.map(process_row, df.to_dict(orient="records")))
-
-results = [r for r in results if r is not None]
-
-features_df = pd.DataFrame(results)
-features_df.to_csv("datasets/result.csv", index=False)
-
-print("Dataset Gerado!!")
+import argparse
+import asyncio
+
+from dataset_builder import build_dataset
+from sharding import build_sharded, merge, partition, run_shard
+from utils.columnar import columnar_path, write_columnar
+from utils.metrics import metrics
+from utils.rate_limit import scheduler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gera o dataset de features a partir das URLs rotuladas.")
+    parser.add_argument("--input", default="datasets/url_with_result.csv")
+    parser.add_argument("--output", default="datasets/result.csv")
+    parser.add_argument("--chunksize", type=int, default=10000)
+    parser.add_argument("--max-in-flight", type=int, default=100)
+    parser.add_argument("--fresh", action="store_true", help="ignora o checkpoint e a partição em shards e recomeça do zero")
+    parser.add_argument(
+        "--no-preflight",
+        dest="preflight",
+        action="store_false",
+        help="roda todas as checagens mesmo para hosts que não resolvem ou não aceitam conexão",
+    )
+    parser.add_argument(
+        "--no-store",
+        dest="incremental",
+        action="store_false",
+        help="não usa o feature store: recalcula todas as features e não grava nada nele",
+    )
+    parser.add_argument(
+        "--recompute",
+        action="store_true",
+        help="recalcula todas as features, mas atualiza o feature store com os novos valores",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        dest="dedup",
+        action="store_false",
+        help="extrai cada linha por inteiro, sem reaproveitar URLs repetidas nem checagens por domínio",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet", "arrow"],
+        default="csv",
+        help="também grava o resultado em formato colunar (features int8 + manifesto)",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        help="grava as métricas por checagem (.json, ou texto Prometheus para .prom)",
+    )
+
+    sharding = parser.add_argument_group("execução particionada por domínio")
+    sharding.add_argument("--shards", type=int, default=1, help="número de shards / processos")
+    sharding.add_argument("--shard-dir", default="datasets/shards")
+    sharding.add_argument(
+        "--shard-index", type=int, help="processa apenas este shard (uma máquina por shard)"
+    )
+    sharding.add_argument("--partition-only", action="store_true", help="apenas particiona a entrada")
+    sharding.add_argument("--merge-only", action="store_true", help="apenas junta os shards prontos")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.partition_only:
+        partition(args.input, args.shard_dir, args.shards, args.chunksize, args.fresh)
+    elif args.merge_only:
+        merge(args.shard_dir, args.shards, args.output)
+    elif args.shard_index is not None:
+        # Nodes share the partition made beforehand with --partition-only.
+        run_shard(
+            args.shard_dir, args.shard_index, args.shards, args.max_in_flight, args.chunksize, args.fresh,
+            args.preflight, args.incremental, args.recompute, args.dedup,
+        )
+    elif args.shards > 1:
+        build_sharded(
+            args.input, args.output, args.shard_dir, args.shards,
+            args.max_in_flight, args.chunksize, args.fresh, args.preflight,
+            args.incremental, args.recompute, args.dedup,
+        )
+    else:
+        asyncio.run(
+            build_dataset(
+                args.input,
+                args.output,
+                chunksize=args.chunksize,
+                max_in_flight=args.max_in_flight,
+                fresh=args.fresh,
+                preflight=args.preflight,
+                incremental=args.incremental,
+                recompute=args.recompute,
+                dedup=args.dedup,
+            )
+        )
+
+    if args.format != "csv" and not (args.partition_only or args.shard_index is not None):
+        path = columnar_path(args.output, args.format)
+        rows = write_columnar(args.output, path)
+        print(f"{rows} linhas gravadas em {path}")
+
+    print("Dataset Gerado!!")
+    for service, stats in scheduler.metrics().items():
+        print(
+            f"[{service}] fila={stats['queued']} concluidas={stats['completed']} "
+            f"espera media={stats['avg_wait_ms']:.1f}ms max={stats['max_wait_ms']:.1f}ms"
+        )
+
+    print()
+    print(metrics.summary())
+    if args.metrics_out:
+        metrics.export(args.metrics_out)
+        print(f"Métricas gravadas em {args.metrics_out}")
@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from features.names import FEATURE_NAMES
+from models.train import linear_estimator
+from scoring.compact import COMPACT_VERSION, CompactModel, compact_path
+from scoring.model import MODEL_PATHS
+
+# Largest |p_compact - p_original| accepted by the parity check. XGBoost
+# sums leaves in float32, the compact scorer in float64.
+TOLERANCE = {"forest": 1e-9, "boosted": 1e-5, "linear": 1e-9}
+
+# Values a feature can take at inference: FEATURE_TIMEOUT, error, 0 and 1.
+FEATURE_VALUES = np.array([-2, -1, 0, 1], dtype=np.float32)
+
+
+class UnsupportedModel(ValueError):
+    """The model has no compact form (e.g. a kernel SVC); it is skipped, not failed."""
+
+
+def _feature_order(model) -> List[str]:
+    names = getattr(model, "feature_names_in_", None)
+    return list(names) if names is not None else list(FEATURE_NAMES)
+
+
+def _positive(model) -> int:
+    """Column of the "bad" class (label 1) in predict_proba."""
+    return list(model.classes_).index(1)
+
+
+def _pack_trees(trees: List[Dict[str, np.ndarray]]) -> Tuple[Dict[str, np.ndarray], int]:
+    """
+    Concatenates per-tree node arrays into the CompactModel layout: global
+    child indices, and leaves that point to themselves with feature 0.
+    Each tree dict has left/right (-1 at leaves), feature, threshold,
+    value and depth.
+    """
+    left, right, feature, threshold, value, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        n = len(tree["left"])
+        index = np.arange(offset, offset + n, dtype=np.int32)
+        leaf = tree["left"] < 0
+        left.append(np.where(leaf, index, tree["left"] + offset).astype(np.int32))
+        right.append(np.where(leaf, index, tree["right"] + offset).astype(np.int32))
+        feature.append(np.where(leaf, 0, tree["feature"]).astype(np.int32))
+        threshold.append(np.where(leaf, 0.0, tree["threshold"]).astype(np.float64))
+        value.append(np.asarray(tree["value"], dtype=np.float64))
+        roots.append(offset)
+        offset += n
+    arrays = {
+        "roots": np.array(roots, dtype=np.int32),
+        "left": np.concatenate(left),
+        "right": np.concatenate(right),
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "value": np.concatenate(value),
+    }
+    return arrays, max(tree["depth"] for tree in trees)
+
+
+def export_forest(model) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    positive = _positive(model)
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        counts = tree.value[:, 0, :]
+        trees.append(
+            {
+                "left": tree.children_left,
+                "right": tree.children_right,
+                "feature": tree.feature,
+                "threshold": tree.threshold,
+                # Class fractions at each node, as predict_proba uses them.
+                "value": counts[:, positive] / counts.sum(axis=1),
+                "depth": tree.max_depth,
+            }
+        )
+    arrays, depth = _pack_trees(trees)
+    return {"kind": "forest", "depth": depth}, arrays
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    depth, level = 0, [0]
+    while True:
+        level = [child for node in level for child in (left[node], right[node]) if child >= 0]
+        if not level:
+            return depth
+        depth += 1
+
+
+def export_boosted(model, feature_order: List[str]) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    booster = model.get_booster()
+    config = json.loads(booster.save_config())
+    objective = config["learner"]["objective"]["name"]
+    if objective != "binary:logistic":
+        raise UnsupportedModel(f"objetivo XGBoost não suportado: {objective}")
+    # Stored as a probability; "[5E-1]" on recent versions.
+    base_score = float(config["learner"]["learner_model_param"]["base_score"].strip("[]"))
+    names = booster.feature_names or [f"f{i}" for i in range(len(feature_order))]
+    columns = {name: i for i, name in enumerate(names)}
+
+    trees = []
+    for _, nodes in booster.trees_to_dataframe().groupby("Tree", sort=True):
+        # Node ids can have gaps after pruning; renumber them densely.
+        local = {node_id: i for i, node_id in enumerate(nodes["ID"])}
+        leaf = (nodes["Feature"] == "Leaf").to_numpy()
+        left = np.array([-1 if is_leaf else local[yes] for is_leaf, yes in zip(leaf, nodes["Yes"])])
+        right = np.array([-1 if is_leaf else local[no] for is_leaf, no in zip(leaf, nodes["No"])])
+        # XGBoost goes left on x < split (in float32); for float32 x that is
+        # x <= the next float32 below split.
+        split = nodes["Split"].fillna(0).to_numpy(dtype=np.float32)
+        threshold = np.nextafter(split, np.float32(-np.inf)).astype(np.float64)
+        trees.append(
+            {
+                "left": left,
+                "right": right,
+                "feature": np.array([0 if is_leaf else columns[f] for is_leaf, f in zip(leaf, nodes["Feature"])]),
+                "threshold": threshold,
+                "value": np.where(leaf, nodes["Gain"].to_numpy(dtype=np.float64), 0.0),
+                "depth": _tree_depth(left, right),
+            }
+        )
+    arrays, depth = _pack_trees(trees)
+    base_margin = float(np.log(base_score / (1 - base_score)))
+    return {"kind": "boosted", "depth": depth, "base_margin": base_margin}, arrays
+
+
+def export_linear(model) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    A calibrated linear SVM (see models/train.py) or any model with coef_
+    and a logistic link, such as LogisticRegression.
+    """
+    weights, bias, sigmoid_a, sigmoid_b = [], [], [], []
+    if hasattr(model, "calibrated_classifiers_"):
+        for calibrated in model.calibrated_classifiers_:
+            estimator = linear_estimator(calibrated.estimator)
+            calibrator = getattr(calibrated, "calibrators", None) or calibrated.calibrators_
+            if not hasattr(calibrator[0], "a_"):
+                raise UnsupportedModel("apenas calibração sigmoid é suportada")
+            weights.append(estimator.coef_[0])
+            bias.append(estimator.intercept_[0])
+            sigmoid_a.append(calibrator[0].a_)
+            sigmoid_b.append(calibrator[0].b_)
+    elif hasattr(model, "coef_") and not hasattr(model, "probA_"):
+        # p = 1 / (1 + exp(-decision)).
+        weights, bias, sigmoid_a, sigmoid_b = [model.coef_[0]], [model.intercept_[0]], [-1.0], [0.0]
+    else:
+        raise UnsupportedModel(f"{type(model).__name__} não suportado; treine o SVM com --svm linear ou sgd")
+    arrays = {
+        "weights": np.array(weights, dtype=np.float64),
+        "bias": np.array(bias, dtype=np.float64),
+        "sigmoid_a": np.array(sigmoid_a, dtype=np.float64),
+        "sigmoid_b": np.array(sigmoid_b, dtype=np.float64),
+    }
+    return {"kind": "linear"}, arrays
+
+
+def compile_model(model) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    feature_order = _feature_order(model)
+    if hasattr(model, "estimators_") and hasattr(model.estimators_[0], "tree_"):
+        meta, arrays = export_forest(model)
+    elif hasattr(model, "get_booster"):
+        meta, arrays = export_boosted(model, feature_order)
+    else:
+        meta, arrays = export_linear(model)
+    meta.update(version=COMPACT_VERSION, feature_order=feature_order, arrays=sorted(arrays))
+    return meta, arrays
+
+
+def write_compact(path: str, meta: Dict, arrays: Dict[str, np.ndarray]) -> None:
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, name + ".npy"), np.ascontiguousarray(array))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def parity_rows(feature_order: List[str], rows: int, features_path: Optional[str], seed: int = 42) -> np.ndarray:
+    """Random vectors over every feature value, plus rows of the feature table if there is one."""
+    rng = np.random.default_rng(seed)
+    X = rng.choice(FEATURE_VALUES, size=(rows, len(feature_order)))
+    if features_path and os.path.exists(features_path):
+        from utils.columnar import load_features
+
+        table = load_features(features_path, columns=None)[feature_order].to_numpy(dtype=np.float32)
+        sample = table[rng.permutation(len(table))[:rows]]
+        X = np.vstack([X, sample])
+    return X
+
+
+def check_parity(model, compact: CompactModel, X: np.ndarray, tolerance: float) -> Dict:
+    expected = model.predict_proba(pd.DataFrame(X, columns=compact.feature_order))[:, _positive(model)]
+    actual = compact.probabilities(X)
+    diff = float(np.abs(expected - actual).max())
+    labels = float(((expected > 0.5) == (actual > 0.5)).mean())
+    if diff > tolerance:
+        raise ValueError(f"paridade falhou: diferença máxima {diff:.3g} > {tolerance:.3g}")
+    return {"rows": len(X), "max_abs_diff": diff, "label_agreement": labels}
+
+
+def single_row_micros(predict, x, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        predict(x)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def load_model(path: str) -> Tuple[object, Optional[str]]:
+    """
+    The pickled model, and the scikit-learn version it was saved with when
+    that differs from the installed one. Such pickles can predict wrongly
+    (tree values changed meaning in 1.4), which the parity check catches.
+    """
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        model = joblib.load(path)
+    saved = None
+    for warning in caught:
+        if hasattr(warning.message, "original_sklearn_version"):
+            saved = warning.message.original_sklearn_version
+        else:
+            warnings.showwarning(warning.message, warning.category, warning.filename, warning.lineno)
+    return model, saved
+
+
+def export(name_or_path: str, rows: int = 5000, features_path: Optional[str] = None) -> Dict:
+    """
+    Compiles a trained model into a .compact directory next to its pickle,
+    then checks that the compact scorer reproduces the model's
+    probabilities before keeping it.
+    """
+    source = MODEL_PATHS.get(name_or_path, name_or_path)
+    model, saved_version = load_model(source)
+    meta, arrays = compile_model(model)
+    meta["source"] = os.path.relpath(source, ROOT)
+
+    path = compact_path(source)
+    write_compact(path, meta, arrays)
+    compact = CompactModel.load(path)
+    X = parity_rows(compact.feature_order, rows, features_path)
+    try:
+        parity = check_parity(model, compact, X, TOLERANCE[meta["kind"]])
+    except ValueError as e:
+        shutil.rmtree(path, ignore_errors=True)
+        if saved_version:
+            raise ValueError(f"{e}; modelo salvo com scikit-learn {saved_version}, retreine com models/train.py") from e
+        raise
+
+    x = X[:1]
+    frame = pd.DataFrame(x, columns=compact.feature_order)
+    size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return {
+        "model": name_or_path,
+        "path": path,
+        "kind": meta["kind"],
+        "bytes": size,
+        "pickle_bytes": os.path.getsize(source),
+        "parity": parity,
+        "compact_us": single_row_micros(compact.probabilities, x, 2000),
+        "original_us": single_row_micros(model.predict_proba, frame, 200),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Exporta os modelos treinados para arrays NumPy (scoring/compact.py) e confere a paridade."
+    )
+    parser.add_argument("--models", nargs="+", default=list(MODEL_PATHS), help="nomes (rf, xgb, svm, lexical) ou caminhos .pkl")
+    parser.add_argument("--rows", type=int, default=5000, help="vetores aleatórios na checagem de paridade")
+    parser.add_argument("--features", default=os.getenv("FEATURES_PATH", "datasets/result.csv"))
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    failed = False
+    for name in args.models:
+        if not os.path.exists(MODEL_PATHS.get(name, name)):
+            print(f"[{name}] modelo não encontrado; pulando")
+            continue
+        try:
+            report = export(name, args.rows, args.features)
+        except UnsupportedModel as e:
+            print(f"[{name}] {e}; pulando")
+            continue
+        except ValueError as e:
+            print(f"[{name}] exportação falhou: {e}")
+            failed = True
+            continue
+        parity = report["parity"]
+        print(
+            f"[{name}] {report['kind']} -> {report['path']} ({report['bytes'] / 1024:.0f} KiB, "
+            f"pickle {report['pickle_bytes'] / 1024:.0f} KiB)"
+        )
+        print(
+            f"    paridade em {parity['rows']} linhas: diferença máxima {parity['max_abs_diff']:.2g}, "
+            f"rótulos iguais {parity['label_agreement']:.2%}"
+        )
+        print(f"    1 vetor: {report['compact_us']:.0f}µs compacto vs {report['original_us']:.0f}µs original")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from models.train import main
+
+# Treino e comparação com a cascata ficam em models/train.py
+main(["--models", "lexical"] + sys.argv[1:])
@@ -1,13 +1,16 @@
 import joblib
 import matplotlib.pyplot as plt
-import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.columnar import load_xy
 
 # Carrega o modelo
 rf_model = joblib.load("models/random-forest/rf_model.pkl")
 
 # Mesmos dados usados no treino (sem 'url' e 'label')
-df = pd.read_csv("datasets/result.csv")
-X = df.drop(columns=["url", "label"])
+X, _ = load_xy(os.getenv("FEATURES_PATH", "datasets/result.csv"))
 
 # Importâncias
 importances = rf_model.feature_importances_
@@ -1,14 +1,18 @@
 import joblib
 import matplotlib.pyplot as plt
-import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from models.train import linear_estimator
+from utils.columnar import load_xy
 import numpy as np
 
-# Carrega o modelo SVM linear
-svm_model = joblib.load("models/svm/svm_model.pkl")
+# Carrega o modelo SVM linear (o SVM calibrado guarda os pesos no estimador interno)
+svm_model = linear_estimator(joblib.load("models/svm/svm_model.pkl"))
 
 # Carrega os dados (sem 'url' e 'label')
-df = pd.read_csv("datasets/result.csv")
-X = df.drop(columns=["url", "label"])
+X, _ = load_xy(os.getenv("FEATURES_PATH", "datasets/result.csv"))
 feature_names = X.columns
 
 # Obtém os coeficientes das features
@@ -21,7 +25,7 @@ else:
 plt.figure(figsize=(10, 6))
 plt.barh(feature_names, importances)
 plt.xlabel("Importância Relativa (|coef|)")
-plt.title("Importância das Features - SVM (Linear Kernel)")
+plt.title("Importância das Features - SVM (linear)")
 plt.gca().invert_yaxis()
 plt.tight_layout()
 plt.show()
@@ -0,0 +1,299 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from features.names import LEXICAL_FEATURES
+from scoring.model import MODEL_PATHS
+from utils.columnar import SCHEMA_VERSION, load_xy
+
+SEED = 42
+TEST_SIZE = 0.2
+SPLIT_CACHE_DIR = os.path.join(ROOT, ".cache", "splits")
+REPORT_DIR = os.path.join(ROOT, "models", "reports")
+
+FAMILIES = ("rf", "xgb", "svm", "lexical")
+TITLES = {"rf": "Random Forest", "xgb": "XGBoost", "svm": "SVM", "lexical": "Lexical (cascata)"}
+
+# Above this many training rows "auto" picks SGD over LinearSVC.
+SGD_MIN_ROWS = 200_000
+# Share of the training rows held out to calibrate the linear SVM.
+CALIBRATION_SIZE = 0.1
+
+SPLIT_PARTS = ("X_train", "X_test", "y_train", "y_test")
+
+
+def split_key(path: str, test_size: float = TEST_SIZE, seed: int = SEED) -> str:
+    """Changes whenever the feature table, the split or the schema does."""
+    stat = os.stat(path)
+    ident = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}:{test_size}:{seed}:{SCHEMA_VERSION}"
+    return hashlib.sha1(ident.encode()).hexdigest()[:16]
+
+
+def cached_split(path: str, test_size: float = TEST_SIZE, seed: int = SEED, refresh: bool = False) -> str:
+    """
+    Splits the feature table once and stores the four parts as int8 .npy
+    files, so later runs (and every training worker) memory-map them instead
+    of parsing the table again. Returns the cache directory.
+    """
+    from sklearn.model_selection import train_test_split
+
+    directory = os.path.join(SPLIT_CACHE_DIR, split_key(path, test_size, seed))
+    if not refresh and os.path.exists(os.path.join(directory, "columns.json")):
+        print(f"Usando divisão em cache: {directory}")
+        return directory
+
+    X, y = load_xy(path)
+    # Same split the per-model scripts always used.
+    parts = train_test_split(X, y, test_size=test_size, random_state=seed)
+    os.makedirs(directory, exist_ok=True)
+    for name, part in zip(SPLIT_PARTS, parts):
+        np.save(os.path.join(directory, name + ".npy"), part.to_numpy(dtype=np.int8))
+    # Written last: its presence marks the split as complete.
+    with open(os.path.join(directory, "columns.json"), "w") as f:
+        json.dump(list(X.columns), f)
+    print(f"Divisão gravada em {directory} ({len(parts[0])} treino, {len(parts[1])} teste)")
+    return directory
+
+
+def load_split(directory: str) -> Tuple[pd.DataFrame, pd.DataFrame, np.ndarray, np.ndarray]:
+    with open(os.path.join(directory, "columns.json")) as f:
+        columns = json.load(f)
+    X_train, X_test, y_train, y_test = (
+        np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in SPLIT_PARTS
+    )
+    # DataFrames so the models keep feature_names_in_ for Scorer.
+    return (
+        pd.DataFrame(X_train, columns=columns),
+        pd.DataFrame(X_test, columns=columns),
+        np.asarray(y_train),
+        np.asarray(y_test),
+    )
+
+
+def linear_svm(solver: str, rows: int):
+    if solver == "auto":
+        solver = "sgd" if rows > SGD_MIN_ROWS else "linear"
+    if solver == "kernel":
+        from sklearn.svm import SVC
+
+        # The old model: Platt scaling through an internal 5-fold CV.
+        return SVC(kernel="linear", probability=True, random_state=SEED)
+    if solver == "linear":
+        from sklearn.svm import LinearSVC
+
+        # Primal solver: scales with rows, and rows >> features here.
+        return LinearSVC(dual=False, random_state=SEED)
+    from sklearn.linear_model import SGDClassifier
+
+    return SGDClassifier(loss="hinge", random_state=SEED)
+
+
+def calibrate(model, X: pd.DataFrame, y: np.ndarray):
+    """Sigmoid calibration of an already fitted model on held-out rows."""
+    from sklearn.calibration import CalibratedClassifierCV
+
+    try:
+        from sklearn.frozen import FrozenEstimator  # scikit-learn >= 1.6
+
+        calibrated = CalibratedClassifierCV(FrozenEstimator(model), method="sigmoid")
+    except ImportError:
+        calibrated = CalibratedClassifierCV(model, method="sigmoid", cv="prefit")
+    return calibrated.fit(X, y)
+
+
+def linear_estimator(model):
+    """The fitted linear model inside a calibrated wrapper, for its coef_."""
+    while True:
+        # FrozenEstimator forwards coef_ to the model it wraps, so it has to
+        # be unwrapped before the coef_ test or it is returned itself.
+        if type(model).__name__ == "FrozenEstimator":
+            model = model.estimator
+            continue
+        if hasattr(model, "coef_"):
+            return model
+        if hasattr(model, "calibrated_classifiers_"):
+            model = model.calibrated_classifiers_[0]
+        model = model.estimator if hasattr(model, "estimator") else model.base_estimator
+
+
+def fit(family: str, X: pd.DataFrame, y: np.ndarray, n_jobs: int, svm_solver: str):
+    if family in ("rf", "lexical"):
+        from sklearn.ensemble import RandomForestClassifier
+
+        model = RandomForestClassifier(n_estimators=100, random_state=SEED, n_jobs=n_jobs)
+        return model.fit(X[LEXICAL_FEATURES] if family == "lexical" else X, y)
+    if family == "xgb":
+        from xgboost import XGBClassifier
+
+        model = XGBClassifier(
+            n_estimators=100,
+            max_depth=4,
+            learning_rate=0.1,
+            eval_metric="logloss",
+            tree_method="hist",
+            n_jobs=n_jobs,
+            random_state=SEED,
+        )
+        return model.fit(X, y)
+
+    model = linear_svm(svm_solver, len(X))
+    if hasattr(model, "predict_proba"):
+        return model.fit(X, y)
+    from sklearn.model_selection import train_test_split
+
+    X_fit, X_cal, y_fit, y_cal = train_test_split(
+        X, y, test_size=CALIBRATION_SIZE, random_state=SEED, stratify=y
+    )
+    return calibrate(model.fit(X_fit, y_fit), X_cal, y_cal)
+
+
+def plot_confusion(cm: np.ndarray, title: str, path: str) -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig, ax = plt.subplots()
+    sns.heatmap(cm, annot=True, fmt="d", cmap="Blues", ax=ax)
+    ax.set_xlabel("Predito")
+    ax.set_ylabel("Real")
+    ax.set_title(title)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+def train_family(family: str, split_dir: str, report_dir: str, n_jobs: int, svm_solver: str) -> Dict:
+    """Fits, evaluates and saves one model family. Runs in a worker process."""
+    from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
+
+    X_train, X_test, y_train, y_test = load_split(split_dir)
+    started = time.perf_counter()
+    model = fit(family, X_train, y_train, n_jobs, svm_solver)
+    fit_seconds = time.perf_counter() - started
+
+    X_eval = X_test[LEXICAL_FEATURES] if family == "lexical" else X_test
+    y_pred = model.predict(X_eval)
+    probabilities = model.predict_proba(X_eval)[:, 1]
+    cm = confusion_matrix(y_test, y_pred)
+    plot_confusion(cm, f"Matriz de Confusão do {TITLES[family]}", os.path.join(report_dir, f"{family}_confusion.png"))
+
+    path = MODEL_PATHS[family]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(model, path)
+    return {
+        "model": family,
+        "estimator": type(linear_estimator(model) if family == "svm" else model).__name__,
+        "path": path,
+        "train_rows": len(X_train),
+        "fit_seconds": fit_seconds,
+        "roc_auc": float(roc_auc_score(y_test, probabilities)) if len(set(y_test)) > 1 else None,
+        "confusion_matrix": cm.tolist(),
+        "report": classification_report(y_test, y_pred, output_dict=True),
+        "report_text": classification_report(y_test, y_pred),
+    }
+
+
+def compare_cascade(split_dir: str, full_model: str) -> Optional[Dict]:
+    from scoring.cascade import CASCADE_HIGH, CASCADE_LOW, evaluate_cascade
+    from scoring.model import Scorer
+
+    if not os.path.exists(MODEL_PATHS.get(full_model, full_model)):
+        print(f"Modelo completo '{full_model}' não encontrado; treine-o antes para comparar a cascata.")
+        return None
+    _, X_test, _, y_test = load_split(split_dir)
+    report = evaluate_cascade(
+        Scorer.load("lexical"), Scorer.load(full_model), X_test, pd.Series(y_test), CASCADE_LOW, CASCADE_HIGH
+    )
+    print(f"Faixa de incerteza: [{CASCADE_LOW}, {CASCADE_HIGH}]")
+    print(f"URLs escaladas para o modelo completo: {report['escalation_rate']:.1%}")
+    print(f"Acurácia do modelo completo: {report['full_accuracy']:.4f}")
+    print(f"Acurácia da cascata: {report['cascade_accuracy']:.4f} ({report['accuracy_delta']:+.4f})")
+    return report
+
+
+def train(
+    path: str,
+    families: List[str],
+    jobs: Optional[int] = None,
+    svm_solver: str = "auto",
+    report_dir: str = REPORT_DIR,
+    refresh_split: bool = False,
+) -> Dict[str, Dict]:
+    """
+    Trains the given families side by side, one worker process each, with
+    the cores split evenly between them. Confusion matrices are saved as
+    PNGs and every metric goes to report_dir/metrics.json.
+    """
+    from joblib import Parallel, delayed
+
+    jobs = jobs or os.cpu_count() or 1
+    split_dir = cached_split(path, refresh=refresh_split)
+    os.makedirs(report_dir, exist_ok=True)
+    n_jobs = max(1, jobs // len(families))
+
+    started = time.perf_counter()
+    results = Parallel(n_jobs=min(len(families), jobs))(
+        delayed(train_family)(family, split_dir, report_dir, n_jobs, svm_solver) for family in families
+    )
+    print(f"Treino concluído em {time.perf_counter() - started:.1f}s")
+
+    summary = {}
+    for result in results:
+        print()
+        print(f"== {TITLES[result['model']]} ({result['estimator']}, {result['fit_seconds']:.1f}s) ==")
+        print(result.pop("report_text"))
+        print(f"Modelo salvo em: {result['path']}")
+        summary[result["model"]] = result
+
+    if "lexical" in families:
+        print()
+        summary["lexical"]["cascade"] = compare_cascade(split_dir, os.getenv("CASCADE_FULL_MODEL", "rf"))
+
+    print()
+    print(f"{'modelo':<10}{'acurácia':>10}{'f1 bad':>10}{'auc':>8}{'treino s':>10}")
+    for family, result in summary.items():
+        auc = f"{result['roc_auc']:.4f}" if result["roc_auc"] is not None else "-"
+        print(
+            f"{family:<10}{result['report']['accuracy']:>10.4f}{result['report'].get('1', {}).get('f1-score', 0):>10.4f}"
+            f"{auc:>8}{result['fit_seconds']:>10.1f}"
+        )
+    with open(os.path.join(report_dir, "metrics.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Métricas e gráficos gravados em {report_dir}")
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Treina e compara os modelos em paralelo.")
+    parser.add_argument("--features", default=os.getenv("FEATURES_PATH", "datasets/result.csv"))
+    parser.add_argument("--models", nargs="+", choices=FAMILIES, default=list(FAMILIES))
+    parser.add_argument("--jobs", type=int, help="núcleos a usar (padrão: todos)")
+    parser.add_argument(
+        "--svm",
+        choices=("auto", "linear", "sgd", "kernel"),
+        default="auto",
+        help=f"auto: LinearSVC até {SGD_MIN_ROWS} linhas de treino, SGD acima; kernel: SVC antigo (lento)",
+    )
+    parser.add_argument("--report-dir", default=REPORT_DIR)
+    parser.add_argument("--refresh-split", action="store_true", help="refaz a divisão treino/teste em cache")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    train(args.features, args.models, args.jobs, args.svm, args.report_dir, args.refresh_split)
+
+
+if __name__ == "__main__":
+    main()
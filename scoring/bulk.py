@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from engine import FeatureEngine
+from scoring.cascade import Cascade
+from scoring.model import Scorer
+
+
+class MicroBatcher:
+    """
+    Groups feature vectors submitted by concurrent extractions into one
+    predict_proba call. A batch is sent when it reaches batch_size or when
+    its first vector has waited max_wait seconds, whichever comes first.
+    Inference runs on its own thread, so the next batch fills while the
+    previous one is being scored.
+    """
+
+    def __init__(self, scorer: Scorer, batch_size: int = 256, max_wait: float = 0.05):
+        self.scorer = scorer
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.scored = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def __aenter__(self) -> "MicroBatcher":
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = asyncio.create_task(self._collect())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._queue.put(None)
+        await self._task
+        self._executor.shutdown(wait=True)
+
+    async def score(self, features: Dict[str, int]) -> Dict:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((self.scorer.vector(features), future))
+        return self.scorer.result(await future)
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        pending = set()
+        closed = False
+        while not closed:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    closed = True
+                    break
+                batch.append(item)
+            task = asyncio.create_task(self._flush(batch))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _flush(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        rows = np.stack([vector for vector, _ in batch])
+        try:
+            loop = asyncio.get_running_loop()
+            probabilities = await loop.run_in_executor(self._executor, self.scorer.probabilities, rows)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.scored += len(batch)
+        for (_, future), probability in zip(batch, probabilities):
+            if not future.done():
+                future.set_result(probability)
+
+
+def read_urls(path: str, chunksize: int = 10000) -> Iterator[str]:
+    """URLs from a CSV with a `url` column, or one per line ("-" for stdin)."""
+    if path.endswith(".csv"):
+        for chunk in pd.read_csv(path, usecols=["url"], chunksize=chunksize):
+            yield from chunk["url"].astype(str)
+        return
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            url = line.strip()
+            if url:
+                yield url
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _lexical_stage(
+    urls: Iterable[str], cascade: Cascade, chunksize: int, write: Callable[[Dict], None]
+) -> Iterator[Tuple[str, Optional[float]]]:
+    """
+    Scores URLs with the lexical model a chunk at a time, writes the ones it
+    is sure about and yields the rest, with their first-stage probability,
+    for the full extraction.
+    """
+    urls = iter(urls)
+    while True:
+        chunk = list(itertools.islice(urls, chunksize))
+        if not chunk:
+            return
+        features, probabilities, escalate = cascade.first_stage(chunk)
+        rows = features.to_dict(orient="records")
+        for url, row, probability, uncertain in zip(chunk, rows, probabilities, escalate):
+            if uncertain:
+                yield url, float(probability)
+                continue
+            result = cascade.lexical.result(probability)
+            result.update(
+                url=url,
+                features={name: int(value) for name, value in row.items()},
+                stage="lexical",
+                lexical_probability=float(probability),
+            )
+            write(result)
+
+
+async def score_bulk(
+    urls: Iterator[str],
+    scorer: Scorer,
+    out: TextIO,
+    batch_size: int = 256,
+    max_wait: float = 0.05,
+    max_in_flight: int = 100,
+    cascade: Optional[Cascade] = None,
+) -> Dict[str, float]:
+    """
+    Extracts and scores every URL, writing one JSON line per URL as soon as
+    its batch comes back. Lines are in completion order, not input order.
+    With a cascade, only URLs the lexical model is unsure about are extracted
+    and scored by the full model.
+    """
+    started = time.perf_counter()
+    errors = 0
+
+    def write(result: Dict) -> None:
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+    if cascade is not None:
+        items = _lexical_stage(urls, cascade, batch_size, write)
+    else:
+        items = ((url, None) for url in urls)
+
+    async with FeatureEngine(max_urls=max_in_flight) as engine, MicroBatcher(
+        scorer, batch_size, max_wait
+    ) as batcher:
+
+        async def handle(engine: FeatureEngine, item: Tuple[str, Optional[float]]) -> None:
+            nonlocal errors
+            url, lexical_probability = item
+            try:
+                features = await engine.extract(url)
+                result = await batcher.score(features)
+            except Exception as e:
+                errors += 1
+                print(f"(bulk) Error in {url}: {e}", file=sys.stderr)
+                return
+            result.update(url=url, features=features)
+            if cascade is not None:
+                result.update(stage="full", lexical_probability=lexical_probability)
+            write(result)
+
+        await engine.run(items, handle)
+
+    elapsed = time.perf_counter() - started
+    scored = batcher.scored
+    stats = {"errors": errors, "batches": batcher.batches}
+    if cascade is not None:
+        scored += cascade.scored - cascade.escalated
+        stats.update(cascade.metrics())
+    stats.update(
+        scored=scored,
+        avg_batch_size=batcher.scored / batcher.batches if batcher.batches else 0.0,
+        urls_per_second=scored / elapsed if elapsed else 0.0,
+    )
+    return stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Classifica uma lista de URLs em lote.")
+    parser.add_argument("input", help="CSV com coluna url, arquivo com uma URL por linha ou - (stdin)")
+    parser.add_argument("--output", default="-", help="arquivo JSONL de saída (- para stdout)")
+    parser.add_argument("--model", default=os.getenv("SCORING_MODEL", "rf"), help="rf, xgb, svm ou caminho do .pkl")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--max-wait", type=float, default=0.05, help="espera máxima (s) para fechar um lote")
+    parser.add_argument("--max-in-flight", type=int, default=100)
+    parser.add_argument(
+        "--cascade", action="store_true", help="usa o modelo lexical primeiro e só consulta a rede na dúvida"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    scorer = Scorer.load(args.model)
+    cascade = Cascade(Scorer.load("lexical"), scorer) if args.cascade else None
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = asyncio.run(
+            score_bulk(
+                read_urls(args.input), scorer, out,
+                args.batch_size, args.max_wait, args.max_in_flight, cascade,
+            )
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(
+        f"{stats['scored']} URLs em {stats['batches']} lotes "
+        f"(média {stats['avg_batch_size']:.1f}), {stats['urls_per_second']:.1f} URLs/s, "
+        f"{stats['errors']} erros",
+        file=sys.stderr,
+    )
+    if cascade is not None:
+        print(f"{stats['escalation_rate']:.1%} das URLs precisaram das checagens de rede", file=sys.stderr)
@@ -0,0 +1,87 @@
+import os
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from features.lexical import extract_lexical
+from scoring.model import Scorer
+
+load_dotenv()
+
+# First-stage probabilities inside [low, high] are escalated to the full model.
+CASCADE_LOW = float(os.getenv("CASCADE_LOW", 0.2))
+CASCADE_HIGH = float(os.getenv("CASCADE_HIGH", 0.8))
+
+
+def uncertain(probabilities: np.ndarray, low: float = CASCADE_LOW, high: float = CASCADE_HIGH) -> np.ndarray:
+    return (probabilities >= low) & (probabilities <= high)
+
+
+class Cascade:
+    """
+    Two-stage scoring. A model trained on the lexical features scores every
+    URL without touching the network; only URLs it is unsure about go
+    through the full extraction and the full model.
+    """
+
+    def __init__(self, lexical: Scorer, full: Scorer, low: float = CASCADE_LOW, high: float = CASCADE_HIGH):
+        self.lexical = lexical
+        self.full = full
+        self.low = low
+        self.high = high
+        self.scored = 0
+        self.escalated = 0
+
+    @classmethod
+    def load(cls, full: str = "rf", lexical: str = "lexical", **kwargs) -> "Cascade":
+        return cls(Scorer.load(lexical), Scorer.load(full), **kwargs)
+
+    def first_stage(self, urls: Iterable[str]) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """
+        Lexical features, first-stage probabilities and the escalation mask
+        for a batch of URLs.
+        """
+        features = extract_lexical(urls)
+        probabilities = self.lexical.probabilities(features[self.lexical.feature_order].to_numpy())
+        escalate = uncertain(probabilities, self.low, self.high)
+        self.scored += len(features)
+        self.escalated += int(escalate.sum())
+        return features, probabilities, escalate
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "scored": self.scored,
+            "escalated": self.escalated,
+            "escalation_rate": self.escalated / self.scored if self.scored else 0.0,
+            "band": [self.low, self.high],
+        }
+
+
+def evaluate_cascade(
+    lexical: Scorer,
+    full: Scorer,
+    X: pd.DataFrame,
+    y: pd.Series,
+    low: float = CASCADE_LOW,
+    high: float = CASCADE_HIGH,
+) -> Dict[str, float]:
+    """
+    Replays the cascade on a labelled feature table and compares it with
+    scoring every row with the full model.
+    """
+    first = lexical.probabilities(X[lexical.feature_order].to_numpy())
+    second = full.probabilities(X[full.feature_order].to_numpy())
+    escalate = uncertain(first, low, high)
+    cascade = np.where(escalate, second, first) >= full.threshold
+    truth = y.to_numpy()
+
+    full_accuracy = float(((second >= full.threshold) == truth).mean())
+    cascade_accuracy = float((cascade == truth).mean())
+    return {
+        "escalation_rate": float(escalate.mean()),
+        "full_accuracy": full_accuracy,
+        "cascade_accuracy": cascade_accuracy,
+        "accuracy_delta": cascade_accuracy - full_accuracy,
+    }
@@ -0,0 +1,83 @@
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+# Format of the directories written by models/export.py.
+COMPACT_VERSION = 1
+COMPACT_SUFFIX = ".compact"
+
+
+def compact_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + COMPACT_SUFFIX
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class CompactModel:
+    """
+    A trained model reduced to NumPy arrays, scored without sklearn or
+    xgboost. Arrays are memory-mapped, so loading is a few file opens.
+
+    kind "forest" (random forest: mean of leaf probabilities) and "boosted"
+    (XGBoost: sigmoid of base margin plus leaf sums) share one node layout:
+    every tree's nodes are concatenated, `roots` holds each tree's first
+    node, and a row goes left when x[feature] <= threshold. Leaves point to
+    themselves, so all trees are walked together for `depth` steps with no
+    per-tree branching. kind "linear" averages the sigmoid-calibrated
+    decision function of one or more weight vectors.
+    """
+
+    def __init__(self, meta: Dict, arrays: Dict[str, np.ndarray]):
+        self.meta = meta
+        self.kind = meta["kind"]
+        self.feature_order: List[str] = meta["feature_order"]
+        # Same name as sklearn's, so Scorer picks the order up.
+        self.feature_names_in_ = np.array(self.feature_order, dtype=object)
+        self.arrays = arrays
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    @classmethod
+    def load(cls, path: str) -> "CompactModel":
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != COMPACT_VERSION:
+            raise ValueError(f"{path}: compact format {meta.get('version')}, expected {COMPACT_VERSION}")
+        arrays = {
+            name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in meta["arrays"]
+        }
+        return cls(meta, arrays)
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf index reached by every row (axis 0) in every tree (axis 1)."""
+        rows = np.arange(len(X))[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.meta["depth"]):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def probabilities(self, X) -> np.ndarray:
+        """Probability of the "bad" class for each row of a 2-D feature array."""
+        # float32 like sklearn and xgboost, compared as float64 thresholds.
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if self.kind == "forest":
+            return self.value[self._leaves(X)].mean(axis=1)
+        if self.kind == "boosted":
+            return _sigmoid(self.meta["base_margin"] + self.value[self._leaves(X)].sum(axis=1))
+        decision = X @ self.weights.T + self.bias
+        return (1.0 / (1.0 + np.exp(self.sigmoid_a * decision + self.sigmoid_b))).mean(axis=1)
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = self.probabilities(X)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        # Ties go to class 0, like argmax over predict_proba.
+        return (self.probabilities(X) > 0.5).astype(np.int64)
@@ -0,0 +1,74 @@
+import os
+from typing import Dict, List, Mapping, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from features.names import FEATURE_NAMES
+from scoring.compact import CompactModel, compact_path
+
+load_dotenv()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODEL_PATHS = {
+    "rf": os.path.join(ROOT, "models", "random-forest", "rf_model.pkl"),
+    "xgb": os.path.join(ROOT, "models", "xgboost", "xgb_model.pkl"),
+    "svm": os.path.join(ROOT, "models", "svm", "svm_model.pkl"),
+    # First stage of the cascade, trained on the lexical features only.
+    "lexical": os.path.join(ROOT, "models", "lexical", "lexical_model.pkl"),
+}
+
+LABELS = {0: "good", 1: "bad"}
+
+# Load the NumPy export written by models/export.py instead of the pickle.
+SCORING_COMPACT = os.getenv("SCORING_COMPACT", "0") == "1"
+
+
+class Scorer:
+    """
+    A trained model plus the feature order it was fitted on. Feature dicts
+    as returned by get_url_features / FeatureEngine.extract are turned into
+    rows in that order.
+    """
+
+    def __init__(self, model, feature_order: Optional[List[str]] = None, threshold: float = 0.5):
+        self.model = model
+        names = getattr(model, "feature_names_in_", None)
+        self.feature_order = list(feature_order or (names if names is not None else FEATURE_NAMES))
+        self.threshold = threshold
+
+    @classmethod
+    def load(cls, name_or_path: str, threshold: float = 0.5, compact: bool = SCORING_COMPACT) -> "Scorer":
+        """
+        Loads a model by name or path. A .compact directory, or any model
+        with compact=True whose export exists, is loaded as a CompactModel.
+        """
+        path = MODEL_PATHS.get(name_or_path, name_or_path)
+        if compact and not os.path.isdir(path):
+            if os.path.isdir(compact_path(path)):
+                path = compact_path(path)
+            else:
+                print(f"[SCORING] {compact_path(path)} não encontrado; usando {path}")
+        if os.path.isdir(path):
+            return cls(CompactModel.load(path), threshold=threshold)
+        return cls(joblib.load(path), threshold=threshold)
+
+    def vector(self, features: Mapping[str, int]) -> np.ndarray:
+        return np.array([features.get(name, -1) for name in self.feature_order], dtype=np.float32)
+
+    def probabilities(self, rows: np.ndarray) -> np.ndarray:
+        """Probability of the "bad" class for each row of a 2-D feature array."""
+        if isinstance(self.model, CompactModel):
+            return self.model.probabilities(rows)
+        frame = pd.DataFrame(rows, columns=self.feature_order)
+        return self.model.predict_proba(frame)[:, 1]
+
+    def result(self, probability: float) -> Dict:
+        label = int(probability >= self.threshold)
+        return {"label": label, "label_name": LABELS[label], "probability": float(probability)}
+
+    def score(self, features: Mapping[str, int]) -> Dict:
+        return self.result(self.probabilities(self.vector(features)[np.newaxis, :])[0])
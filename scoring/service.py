@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict
+
+import numpy as np
+from aiohttp import web
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from engine import FeatureEngine
+from scoring.cascade import Cascade
+from scoring.model import Scorer
+from utils.metrics import metrics as check_metrics
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class LatencyWindow:
+    """End-to-end latencies of the last `size` requests, in milliseconds."""
+
+    def __init__(self, size: int = 10000):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.errors = 0
+
+    def add(self, ms: float) -> None:
+        self.samples.append(ms)
+        self.count += 1
+
+    def percentiles(self) -> Dict[str, float]:
+        if not self.samples:
+            return {f"p{p}": 0.0 for p in PERCENTILES}
+        values = np.percentile(np.fromiter(self.samples, dtype=float), PERCENTILES)
+        return {f"p{p}": float(v) for p, v in zip(PERCENTILES, values)}
+
+
+async def score(request: web.Request) -> web.Response:
+    app = request.app
+    if request.method == "POST":
+        url = (await request.json()).get("url")
+    else:
+        url = request.query.get("url")
+    if not url:
+        raise web.HTTPBadRequest(text="missing url")
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    executor = app["engine"].executor
+    try:
+        cascade = app["cascade"]
+        escalate = True
+        if cascade is not None:
+            lexical, probabilities, mask = await loop.run_in_executor(executor, cascade.first_stage, [url])
+            escalate = bool(mask[0])
+
+        if escalate:
+            features = await app["engine"].extract(url)
+            extracted = time.perf_counter()
+            # predict_proba holds the GIL for a few ms; keep it off the event loop.
+            result = await loop.run_in_executor(executor, app["scorer"].score, features)
+        else:
+            features = {name: int(value) for name, value in lexical.iloc[0].items()}
+            extracted = time.perf_counter()
+            result = cascade.lexical.result(probabilities[0])
+
+        if cascade is not None:
+            result.update(stage="full" if escalate else "lexical", lexical_probability=float(probabilities[0]))
+    except Exception as e:
+        app["latency"].errors += 1
+        print(f"(score) Error in {url}: {e}")
+        raise web.HTTPInternalServerError(text=str(e))
+    finished = time.perf_counter()
+    app["latency"].add((finished - started) * 1000)
+
+    result.update(
+        url=url,
+        features=features,
+        timings={
+            "extract_ms": (extracted - started) * 1000,
+            "predict_ms": (finished - extracted) * 1000,
+            "total_ms": (finished - started) * 1000,
+        },
+    )
+    return web.json_response(result)
+
+
+async def metrics(request: web.Request) -> web.Response:
+    if request.query.get("format") == "prometheus":
+        return web.Response(text=check_metrics.to_prometheus(), content_type="text/plain")
+    latency = request.app["latency"]
+    return web.json_response(
+        {
+            "model": request.app["model_name"],
+            "requests": latency.count,
+            "errors": latency.errors,
+            "latency_ms": latency.percentiles(),
+            "cascade": request.app["cascade"].metrics() if request.app["cascade"] else None,
+            "services": request.app["engine"].scheduler.metrics(),
+            "checks": check_metrics.snapshot(),
+        }
+    )
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+def create_app(model: str = "rf", max_urls: int = 100, cascade: bool = False) -> web.Application:
+    """
+    The model is loaded and the engine opened once, at startup; every
+    request reuses the engine's session and the process-wide WHOIS, DNS and
+    GeoIP caches. With cascade=True the lexical model answers first and the
+    network checks only run for URLs inside its uncertainty band.
+    """
+    app = web.Application()
+    app["model_name"] = model
+    app["scorer"] = Scorer.load(model)
+    app["cascade"] = Cascade(Scorer.load("lexical"), app["scorer"]) if cascade else None
+    app["latency"] = LatencyWindow()
+
+    async def engine_context(app: web.Application):
+        async with FeatureEngine(max_urls=max_urls) as engine:
+            app["engine"] = engine
+            yield
+
+    app.cleanup_ctx.append(engine_context)
+    app.router.add_post("/score", score)
+    app.router.add_get("/score", score)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/health", health)
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serviço de classificação de URLs.")
+    parser.add_argument("--model", default=os.getenv("SCORING_MODEL", "rf"), help="rf, xgb, svm ou caminho do .pkl")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix", help="escuta neste socket Unix em vez de TCP")
+    parser.add_argument("--max-urls", type=int, default=100)
+    parser.add_argument(
+        "--cascade", action="store_true", help="usa o modelo lexical primeiro e só consulta a rede na dúvida"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    app = create_app(args.model, args.max_urls, args.cascade)
+    if args.unix:
+        web.run_app(app, path=args.unix)
+    else:
+        web.run_app(app, host=args.host, port=args.port)
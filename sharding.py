@@ -0,0 +1,187 @@
+import asyncio
+import csv
+import glob
+import heapq
+import json
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from dataset_builder import OUTPUT_COLUMNS, build_dataset
+from features.parsing import parse_url
+from utils.metrics import metrics
+from utils.rate_limit import scheduler
+
+# Original input row number, carried through each shard so the merge can
+# restore input order.
+ROW_COLUMN = "_row"
+PARTITION_MARKER = "partition.done"
+
+
+def shard_of(url: str, num_shards: int) -> int:
+    """Stable shard for a URL: every URL of a registered domain lands together."""
+    parsed = parse_url(url)
+    key = parsed.registered_domain or parsed.host or url
+    return zlib.crc32(key.lower().encode("utf-8")) % num_shards
+
+
+def shard_paths(shard_dir: str, index: int) -> Dict[str, str]:
+    return {
+        "input": os.path.join(shard_dir, f"input-{index:03d}.csv"),
+        "output": os.path.join(shard_dir, f"result-{index:03d}.csv"),
+        "metrics": os.path.join(shard_dir, f"metrics-{index:03d}.json"),
+    }
+
+
+def _input_identity(input_path: str) -> Dict:
+    stat = os.stat(input_path)
+    return {"input": os.path.abspath(input_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_marker(marker: str) -> Optional[Dict]:
+    if not os.path.exists(marker):
+        return None
+    with open(marker) as f:
+        content = f.read().strip()
+    try:
+        return json.loads(content)
+    except ValueError:
+        # Markers written before the input was recorded hold the shard count only.
+        return {"num_shards": int(content)}
+
+
+def _clear_shards(shard_dir: str) -> None:
+    """Removes shard inputs and every result, checkpoint and metrics file built from them."""
+    for pattern in ("input-*.csv", "result-*.csv", "result-*.csv.checkpoint", "metrics-*.json"):
+        for path in glob.glob(os.path.join(shard_dir, pattern)):
+            os.remove(path)
+
+
+def partition(input_path: str, shard_dir: str, num_shards: int, chunksize: int = 10000,
+              fresh: bool = False) -> None:
+    """
+    Splits input_path into num_shards CSVs by registered-domain hash. Safe to
+    call again: a finished partition of the same input (path, size and
+    mtime, recorded in the marker) is left untouched. A changed input, or
+    fresh, partitions again and drops the results built from the old shards.
+    """
+    marker = os.path.join(shard_dir, PARTITION_MARKER)
+    identity = _input_identity(input_path)
+    existing = _read_marker(marker)
+    if existing is not None and not fresh:
+        if {key: existing.get(key) for key in identity} == identity:
+            if existing["num_shards"] != num_shards:
+                raise ValueError(
+                    f"{shard_dir} was partitioned into {existing['num_shards']} shards, not {num_shards}; "
+                    "use --fresh to partition again"
+                )
+            return
+        print(f"[SHARDS] {input_path} mudou desde a última partição; particionando de novo")
+
+    if os.path.exists(marker):
+        os.remove(marker)
+    os.makedirs(shard_dir, exist_ok=True)
+    _clear_shards(shard_dir)
+
+    columns = None
+    written = set()
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        chunk[ROW_COLUMN] = chunk.index
+        columns = list(chunk.columns)
+        shards = chunk["url"].astype(str).map(lambda url: shard_of(url, num_shards))
+        for index, rows in chunk.groupby(shards):
+            path = shard_paths(shard_dir, index)["input"]
+            rows.to_csv(path, mode="a", header=index not in written, index=False)
+            written.add(index)
+
+    # Shards that received no rows still get a header-only file.
+    for index in set(range(num_shards)) - written:
+        pd.DataFrame(columns=columns or ["url", "type", ROW_COLUMN]).to_csv(
+            shard_paths(shard_dir, index)["input"], index=False
+        )
+
+    with open(marker, "w") as f:
+        json.dump({"num_shards": num_shards, **identity}, f)
+
+
+def run_shard(shard_dir: str, index: int, num_shards: int, max_in_flight: int = 100,
+              chunksize: int = 10000, fresh: bool = False, preflight: bool = True,
+              incremental: bool = True, recompute: bool = False, dedup: bool = True) -> str:
+    """
+    Builds one shard with its own engine. Per-service rate budgets are split
+    evenly between shards, since they all call the same upstreams.
+    """
+    scheduler.scale(1 / num_shards)
+    paths = shard_paths(shard_dir, index)
+    asyncio.run(
+        build_dataset(
+            paths["input"],
+            paths["output"],
+            chunksize=chunksize,
+            max_in_flight=max_in_flight,
+            fresh=fresh,
+            passthrough=[ROW_COLUMN],
+            preflight=preflight,
+            incremental=incremental,
+            recompute=recompute,
+            dedup=dedup,
+        )
+    )
+    # Each shard process has its own counters; the parent adds them up.
+    with open(paths["metrics"], "w") as f:
+        json.dump(metrics.snapshot(), f)
+    return paths["output"]
+
+
+def _sorted_rows(path: str) -> Iterator[Tuple[int, List[str]]]:
+    # A shard holds 1/N of the output, so sorting one in memory is cheap.
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        position = header.index(ROW_COLUMN)
+        rows = sorted(reader, key=lambda row: int(row[position]))
+    for row in rows:
+        yield int(row[position]), row[:position] + row[position + 1:]
+
+
+def merge(shard_dir: str, num_shards: int, output_path: str) -> None:
+    """Merges shard outputs into output_path in original input order."""
+    outputs = [shard_paths(shard_dir, index)["output"] for index in range(num_shards)]
+    missing = [path for path in outputs if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Shards not built yet: {', '.join(missing)}")
+
+    with open(output_path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow(OUTPUT_COLUMNS)
+        for _, row in heapq.merge(*(_sorted_rows(path) for path in outputs), key=lambda item: item[0]):
+            writer.writerow(row)
+
+
+def build_sharded(input_path: str, output_path: str, shard_dir: str, num_shards: int,
+                  max_in_flight: int = 100, chunksize: int = 10000, fresh: bool = False,
+                  preflight: bool = True, incremental: bool = True, recompute: bool = False,
+                  dedup: bool = True) -> None:
+    """
+    Partitions, builds every shard in its own process and merges the
+    results. fresh also partitions the input again.
+    """
+    partition(input_path, shard_dir, num_shards, chunksize, fresh)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=num_shards, mp_context=context) as executor:
+        futures = [
+            executor.submit(
+                run_shard, shard_dir, index, num_shards, max_in_flight, chunksize, fresh, preflight,
+                incremental, recompute, dedup,
+            )
+            for index in range(num_shards)
+        ]
+        for index, future in enumerate(futures):
+            future.result()
+            with open(shard_paths(shard_dir, index)["metrics"]) as f:
+                metrics.merge(json.load(f))
+    merge(shard_dir, num_shards, output_path)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
@@ -0,0 +1,33 @@
+"""
+Writes geoip-country.mmdb, the tiny Country database used by
+tests/test_geoip.py. Needs mmdb-writer (pip install mmdb-writer); the
+generated file is committed, so the tests themselves do not.
+"""
+import os
+
+from mmdb_writer import MMDBWriter
+from netaddr import IPSet
+
+NETWORKS = {
+    "8.8.8.0/24": "US",
+    "200.160.0.0/20": "BR",
+    "85.214.0.0/16": "DE",
+    "2a01:238::/32": "DE",
+}
+
+
+def main() -> None:
+    writer = MMDBWriter(
+        ip_version=6,
+        ipv4_compatible=True,
+        database_type="GeoLite2-Country",
+        languages=["en"],
+        description="url-analyser-tool test fixture",
+    )
+    for network, country in NETWORKS.items():
+        writer.insert_network(IPSet([network]), {"country": {"iso_code": country, "names": {"en": country}}})
+    writer.to_db_file(os.path.join(os.path.dirname(__file__), "geoip-country.mmdb"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import asyncio
+import csv
+
+import pytest
+
+import dataset_builder
+from builder_csv import FEATURE_CHECKS
+from dataset_builder import OUTPUT_COLUMNS, Checkpoint, build_dataset
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FakeEngine:
+    """
+    Stands in for FeatureEngine: every feature is 0, and run() handles the
+    items in `order` (positions in the pending input) and then stops,
+    raising Interrupted if some were left, like a killed run.
+    """
+
+    order = None
+    extracted = []
+
+    def __init__(self, **kwargs):
+        self.domain_results = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def extract(self, url, names=None):
+        FakeEngine.extracted.append(url)
+        return {name: 0 for name in FEATURE_CHECKS}
+
+    async def run(self, items, handle):
+        items = list(items)
+        order = range(len(items)) if FakeEngine.order is None else FakeEngine.order
+        for position in order:
+            await handle(self, items[position])
+        if len(order) < len(items):
+            raise Interrupted()
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(dataset_builder, "FeatureEngine", FakeEngine)
+    FakeEngine.order = None
+    FakeEngine.extracted = []
+    return FakeEngine
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "input.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["url", "type"])
+        for i in range(10):
+            writer.writerow([f"http://site{i}.test/", "good" if i % 2 else "phishing"])
+    return str(path), str(tmp_path / "result.csv")
+
+
+def build(input_path, output_path, **kwargs):
+    asyncio.run(
+        build_dataset(
+            input_path, output_path, checkpoint_every=2, preflight=False, incremental=False, dedup=False, **kwargs
+        )
+    )
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_checkpoint_watermark_only_advances_over_contiguous_rows(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "state"))
+    for index in (1, 3, 0):
+        checkpoint.mark(index)
+    assert checkpoint.watermark == 2
+    assert checkpoint.done == {3}
+    assert [i for i in range(5) if not checkpoint.is_done(i)] == [2, 4]
+
+    checkpoint.save(123)
+    restored = Checkpoint(checkpoint.path)
+    assert (restored.watermark, restored.done, restored.output_offset) == (2, {3}, 123)
+
+
+def test_interrupted_build_resumes_without_losing_or_repeating_rows(engine, dataset):
+    input_path, output_path = dataset
+    # Out of order, like concurrent workers, then the run dies.
+    engine.order = [1, 0, 3, 2, 5]
+    with pytest.raises(Interrupted):
+        build(input_path, output_path)
+
+    state = Checkpoint(output_path + ".checkpoint")
+    assert state.watermark == 4
+    assert state.done == {5}
+    # A row written after the last checkpoint, by a run killed before it
+    # could save again: it must not survive the resume.
+    with open(output_path, "a") as f:
+        f.write("half-written row\n")
+
+    engine.order = None
+    build(input_path, output_path)
+
+    rows = read_rows(output_path)
+    assert rows[0] == OUTPUT_COLUMNS
+    assert sum(row == OUTPUT_COLUMNS for row in rows) == 1
+    urls = [row[OUTPUT_COLUMNS.index("url")] for row in rows[1:]]
+    assert sorted(urls) == sorted(f"http://site{i}.test/" for i in range(10))
+    # The resumed run only extracted the rows the first one had not finished.
+    assert sorted(engine.extracted[5:]) == sorted(f"http://site{i}.test/" for i in (4, 6, 7, 8, 9))
+
+
+def test_fresh_starts_over(engine, dataset):
+    input_path, output_path = dataset
+    build(input_path, output_path)
+    build(input_path, output_path, fresh=True)
+
+    rows = read_rows(output_path)
+    assert sum(row == OUTPUT_COLUMNS for row in rows) == 1
+    assert len(rows) == 11
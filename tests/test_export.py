@@ -0,0 +1,71 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from features.names import FEATURE_NAMES
+from models.export import TOLERANCE, UnsupportedModel, export
+from models.train import fit, linear_estimator
+from scoring.compact import CompactModel, compact_path
+
+pytest.importorskip("sklearn")
+pytest.importorskip("xgboost")
+
+VALUES = np.array([-2, -1, 0, 1], dtype=np.int8)
+
+
+def synthetic(rows: int, seed: int):
+    """Feature vectors over every value a feature can take, with a noisy label."""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.choice(VALUES, size=(rows, len(FEATURE_NAMES))), columns=FEATURE_NAMES)
+    score = (X["has_suspicious_words"] == 1) * 2 + (X["has_low_domain_age"] == 1) + X["uses_https"].eq(0)
+    y = ((score + rng.normal(0, 0.8, rows)) > 1.5).astype(int).to_numpy()
+    return X, y
+
+
+@pytest.fixture(scope="module")
+def data():
+    return synthetic(2000, seed=1)
+
+
+@pytest.mark.parametrize(
+    "family,solver",
+    [("rf", "auto"), ("xgb", "auto"), ("svm", "linear"), ("svm", "sgd"), ("lexical", "auto")],
+)
+def test_compact_model_matches_original(tmp_path, data, family, solver):
+    X, y = data
+    model = fit(family, X, y, n_jobs=1, svm_solver=solver)
+    path = str(tmp_path / f"{family}.pkl")
+    joblib.dump(model, path)
+
+    report = export(path, rows=1000)
+    compact = CompactModel.load(compact_path(path))
+    assert report["parity"]["label_agreement"] == 1.0
+
+    X_test, _ = synthetic(3000, seed=2)
+    X_test = X_test[compact.feature_order]
+    expected = model.predict_proba(X_test)[:, list(model.classes_).index(1)]
+    actual = compact.probabilities(X_test.to_numpy())
+    assert np.abs(expected - actual).max() <= TOLERANCE[compact.kind]
+    assert (compact.predict(X_test.to_numpy()) == model.predict(X_test)).all()
+    # A single vector, as the scoring service sends it.
+    row = X_test.to_numpy()[0]
+    assert compact.probabilities(row)[0] == pytest.approx(expected[0], abs=TOLERANCE[compact.kind])
+
+
+@pytest.mark.parametrize("solver,estimator", [("linear", "LinearSVC"), ("sgd", "SGDClassifier")])
+def test_linear_estimator_unwraps_calibration(data, solver, estimator):
+    X, y = data
+    model = fit("svm", X, y, n_jobs=1, svm_solver=solver)
+    assert type(linear_estimator(model)).__name__ == estimator
+
+
+def test_kernel_svm_is_unsupported(tmp_path, data):
+    from sklearn.svm import SVC
+
+    X, y = data
+    model = SVC(kernel="rbf", random_state=0).fit(X[:300], y[:300])
+    path = str(tmp_path / "svm.pkl")
+    joblib.dump(model, path)
+    with pytest.raises(UnsupportedModel):
+        export(path, rows=100)
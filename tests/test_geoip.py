@@ -0,0 +1,80 @@
+import os
+
+import pytest
+from conftest import FIXTURES
+
+from features import features
+from features.geoip import GeoIPLookup
+from features.validate import URLContext
+
+DB_PATH = os.path.join(FIXTURES, "geoip-country.mmdb")
+
+
+@pytest.fixture
+def lookup():
+    return GeoIPLookup(DB_PATH)
+
+
+def test_country_lookup(lookup):
+    assert lookup.available
+    assert lookup.country("8.8.8.8") == "US"
+    assert lookup.country("200.160.2.3") == "BR"
+    assert lookup.country("85.214.1.1") == "DE"
+    assert lookup.country("2a01:238:1::1") == "DE"
+
+
+def test_unknown_address_has_no_country(lookup):
+    assert lookup.country("1.1.1.1") == ""
+
+
+def test_private_addresses_skip_the_database(lookup):
+    for ip in ("10.0.0.1", "192.168.1.10", "127.0.0.1", "::1", "fd00::1"):
+        assert lookup.country(ip) == ""
+    assert lookup._reader is None
+
+
+def test_lookups_are_cached(lookup):
+    lookup.country("8.8.8.8")
+    lookup.country("8.8.8.8")
+    assert lookup.country.cache_info().hits == 1
+
+
+def test_missing_database_is_unavailable(tmp_path):
+    assert not GeoIPLookup(None).available
+    assert not GeoIPLookup(str(tmp_path / "missing.mmdb")).available
+
+
+class FakeResponse:
+    content = b'{"country": "BR"}'
+
+    def json(self):
+        return {"country": "BR"}
+
+
+@pytest.fixture
+def resolved(monkeypatch):
+    monkeypatch.setattr(features.dns_cache, "resolve_ip", lambda host: "85.214.1.1")
+    return URLContext(url="http://example.de", final_url="http://example.de")
+
+
+def test_check_uses_local_database(monkeypatch, lookup, resolved):
+    def no_http(*args, **kwargs):
+        raise AssertionError("ipinfo.io called with a database configured")
+
+    monkeypatch.setattr(features, "geoip", lookup)
+    monkeypatch.setattr(features.http_client, "get", no_http)
+    assert features.check_ip_from_untrusted_country("http://example.de", context=resolved) == 0
+    assert features.check_ip_from_untrusted_country("http://example.de", ["DE"], context=resolved) == 1
+
+
+def test_check_falls_back_to_ipinfo_without_database(monkeypatch, tmp_path, resolved):
+    requested = []
+
+    def fake_get(url, **kwargs):
+        requested.append(url)
+        return FakeResponse()
+
+    monkeypatch.setattr(features, "geoip", GeoIPLookup(str(tmp_path / "missing.mmdb")))
+    monkeypatch.setattr(features.http_client, "get", fake_get)
+    assert features.check_ip_from_untrusted_country("http://example.de", context=resolved) == 1
+    assert requested and "85.214.1.1" in requested[0]
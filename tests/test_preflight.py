@@ -0,0 +1,45 @@
+import asyncio
+import socket
+
+import pytest
+
+from features import preflight as preflight_module
+from features.preflight import NEEDS_TARGET, preflight, preflight_async
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    for name in ("HTTP_PROXY", "http_proxy", "HTTPS_PROXY", "https_proxy"):
+        monkeypatch.setenv(name, "http://127.0.0.1:9")
+    for name in ("NO_PROXY", "no_proxy"):
+        monkeypatch.setenv(name, "bypassed.test")
+
+
+@pytest.fixture
+def no_network(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError("preflight connected directly")
+
+    monkeypatch.setattr(socket, "create_connection", refuse)
+    monkeypatch.setattr(asyncio, "open_connection", refuse)
+    monkeypatch.setattr(preflight_module, "_resolve", lambda name: None)
+
+    async def resolve_async(name):
+        return None
+
+    monkeypatch.setattr(preflight_module, "_resolve_async", resolve_async)
+
+
+def test_proxied_target_is_left_to_the_proxy(proxy, no_network):
+    result = preflight("https://www.unreachable.test/")
+    assert result.reachable and result.host_resolves
+    assert not NEEDS_TARGET & result.lost_features
+
+    result = asyncio.run(preflight_async("http://www.unreachable.test/"))
+    assert result.reachable and result.host_resolves
+
+
+def test_bypassed_host_is_still_probed(proxy, no_network):
+    result = preflight("http://www.bypassed.test/")
+    assert not result.host_resolves
+    assert NEEDS_TARGET <= result.lost_features
@@ -0,0 +1,201 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from builder_csv import run_check
+from features.store import FeatureStore
+from utils import safe_browsing
+from utils.metrics import metrics
+from utils.safe_browsing import SafeBrowsingClient, SafeBrowsingError, check_safe_browsing, url_expressions
+
+
+def sha256(text: str) -> bytes:
+    return hashlib.sha256(text.encode()).digest()
+
+
+def b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+class StubSafeBrowsing(ThreadingHTTPServer):
+    """
+    Local stand-in for the v4 API. URLs containing "malware" are threats in
+    lookup mode; the Update API serves `prefixes` and resolves `full_hashes`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.requests = []
+        self.fail_updates = False
+        self.list_updates = []
+        self.full_hashes = {}
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v4"
+
+    def count(self, method: str) -> int:
+        return sum(1 for name, _ in self.requests if name == method)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        method = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((method, body))
+        if method == "threatListUpdates:fetch" and self.server.fail_updates:
+            self.send_response(503)
+            self.end_headers()
+            return
+        handler = {
+            "threatMatches:find": self.matches,
+            "threatListUpdates:fetch": self.list_updates,
+            "fullHashes:find": self.find_full_hashes,
+        }[method]
+        payload = json.dumps(handler(body)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def matches(self, body):
+        matches = [
+            {"threatType": "MALWARE", "threat": {"url": entry["url"]}, "cacheDuration": "0.2s"}
+            for entry in body["threatInfo"]["threatEntries"]
+            if "malware" in entry["url"]
+        ]
+        return {"matches": matches}
+
+    def list_updates(self, body):
+        responses = self.server.list_updates.pop(0) if self.server.list_updates else []
+        return {"listUpdateResponses": responses, "minimumWaitDuration": "3600s"}
+
+    def find_full_hashes(self, body):
+        matches = []
+        for entry in body["threatInfo"]["threatEntries"]:
+            prefix = base64.b64decode(entry["hash"])
+            for full, threat_type in self.server.full_hashes.items():
+                if full.startswith(prefix):
+                    matches.append({"threatType": threat_type, "threat": {"hash": b64(full)}, "cacheDuration": "300s"})
+        return {"matches": matches, "negativeCacheDuration": "300s"}
+
+
+def list_update(prefixes, response_type="FULL_UPDATE", removals=(), state="s1", threat_type="MALWARE"):
+    """One listUpdateResponse adding prefixes, with the checksum of the expected result."""
+    return {
+        "threatType": threat_type,
+        "responseType": response_type,
+        "additions": [{"rawHashes": {"prefixSize": 4, "rawHashes": b64(b"".join(prefixes))}}] if prefixes else [],
+        "removals": [{"rawIndices": {"indices": list(indices)}} for indices in removals],
+        "newClientState": state,
+    }
+
+
+def with_checksum(update, expected):
+    update["checksum"] = {"sha256": b64(hashlib.sha256(b"".join(sorted(expected))).digest())}
+    return update
+
+
+@pytest.fixture
+def stub():
+    server = StubSafeBrowsing()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(stub, **kwargs):
+    return SafeBrowsingClient(api_key="test", api_base=stub.base, session=requests.Session(), timeout=5, **kwargs)
+
+
+def test_concurrent_lookups_share_one_batch(stub):
+    client = make_client(stub, max_wait=0.2)
+    urls = [f"http://site{i}.test/" for i in range(5)] + ["http://malware.test/x"]
+    with ThreadPoolExecutor(len(urls)) as pool:
+        verdicts = dict(zip(urls, pool.map(client.check, urls)))
+
+    assert stub.count("threatMatches:find") == 1
+    entries = stub.requests[0][1]["threatInfo"]["threatEntries"]
+    assert sorted(entry["url"] for entry in entries) == sorted(urls)
+    assert verdicts["http://malware.test/x"][0] is True
+    assert "MALWARE" in verdicts["http://malware.test/x"][1]
+    assert not any(verdicts[url][0] for url in urls[:-1])
+
+
+def test_verdicts_are_cached_for_cache_duration(stub):
+    client = make_client(stub, max_wait=0.01)
+    assert client.check("http://malware.test/x")[0] is True
+    assert client.check("http://malware.test/x")[0] is True
+    assert stub.count("threatMatches:find") == 1
+    # The stub sends cacheDuration "0.2s".
+    time.sleep(0.3)
+    client.check("http://malware.test/x")
+    assert stub.count("threatMatches:find") == 2
+
+
+def test_update_mode_only_calls_the_api_for_listed_prefixes(stub):
+    bad = "http://evil.test/login"
+    full = sha256(url_expressions(bad)[0])
+    stub.list_updates.append([with_checksum(list_update([full[:4]]), [full[:4]])])
+    stub.full_hashes[full] = "SOCIAL_ENGINEERING"
+    client = make_client(stub, mode="update")
+
+    assert client.check("http://clean.test/") == client.check("http://other.test/a")
+    assert client.check("http://clean.test/")[0] is False
+    assert stub.count("fullHashes:find") == 0
+
+    threat, reason = client.check(bad)
+    assert threat is True
+    assert "SOCIAL_ENGINEERING" in reason
+    assert stub.count("fullHashes:find") == 1
+
+
+def test_failed_first_update_is_an_error_not_a_clean_verdict(stub):
+    stub.fail_updates = True
+    client = make_client(stub, mode="update")
+
+    with pytest.raises(SafeBrowsingError):
+        client.check("http://anything.test/")
+    assert client._cached("http://anything.test/") is None
+
+
+def test_api_failure_makes_the_feature_an_error(monkeypatch, tmp_path):
+    # Nothing listens on port 9: every lookup fails to connect.
+    client = SafeBrowsingClient(api_key="test", api_base="http://127.0.0.1:9/v4", session=requests.Session(), timeout=2)
+    monkeypatch.setattr(safe_browsing, "safe_browsing", client)
+
+    assert run_check("safe_browsing", check_safe_browsing, "http://site.test/") == -1
+    assert metrics.snapshot()["safe_browsing"]["outcomes"].get("error", 0) >= 1
+    store = FeatureStore(str(tmp_path / "features.sqlite"))
+    store.put("http://site.test/", {"safe_browsing": -1})
+    assert store.fresh("http://site.test/") == {}
+
+
+def test_removal_indices_refer_to_the_previous_list(stub):
+    prefixes = [bytes([i]) * 4 for i in range(5)]
+    kept = [prefixes[1], prefixes[2], prefixes[4]]
+    stub.list_updates.append([list_update(prefixes)])
+    stub.list_updates.append(
+        [with_checksum(list_update([], "PARTIAL_UPDATE", removals=[[0], [3]], state="s2"), kept)]
+    )
+    client = make_client(stub, mode="update")
+    client.update_lists()
+    client.update_lists()
+
+    assert client._lists["MALWARE"] == {"state": "s2", "prefixes": kept}
+    assert client._prefixes == {4: set(kept)}
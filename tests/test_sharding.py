@@ -0,0 +1,87 @@
+import csv
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from dataset_builder import OUTPUT_COLUMNS
+from sharding import PARTITION_MARKER, ROW_COLUMN, merge, partition, shard_of, shard_paths
+
+URLS = [f"http://www.site{i % 7}.test/page{i}" for i in range(30)]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "input.csv"
+    pd.DataFrame({"url": URLS, "type": ["benign"] * len(URLS)}).to_csv(path, index=False)
+    return str(path)
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def fake_build(shard_dir, num_shards):
+    """Writes each shard's output in reverse, as an out-of-order build would."""
+    for index in range(num_shards):
+        paths = shard_paths(shard_dir, index)
+        rows = pd.read_csv(paths["input"])
+        with open(paths["output"], "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(OUTPUT_COLUMNS + [ROW_COLUMN])
+            for _, row in rows.iloc[::-1].iterrows():
+                writer.writerow([row["url"], row["type"]] + [0] * (len(OUTPUT_COLUMNS) - 2) + [row[ROW_COLUMN]])
+
+
+def test_partition_keeps_domains_together(dataset, tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    partition(dataset, shard_dir, 3, chunksize=8)
+
+    seen = []
+    for index in range(3):
+        rows = pd.read_csv(shard_paths(shard_dir, index)["input"])
+        assert all(shard_of(url, 3) == index for url in rows["url"])
+        seen.extend(rows[ROW_COLUMN])
+    assert sorted(seen) == list(range(len(URLS)))
+
+    with open(os.path.join(shard_dir, PARTITION_MARKER)) as f:
+        assert json.load(f)["num_shards"] == 3
+
+
+def test_partition_is_kept_until_the_input_changes(dataset, tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    partition(dataset, shard_dir, 3)
+    fake_build(shard_dir, 3)
+
+    partition(dataset, shard_dir, 3)
+    assert os.path.exists(shard_paths(shard_dir, 0)["output"])
+    with pytest.raises(ValueError):
+        partition(dataset, shard_dir, 4)
+
+    pd.DataFrame({"url": URLS[:5], "type": ["benign"] * 5}).to_csv(dataset, index=False)
+    os.utime(dataset, ns=(0, 0))
+    partition(dataset, shard_dir, 3)
+    assert not os.path.exists(shard_paths(shard_dir, 0)["output"])
+    assert sum(len(pd.read_csv(shard_paths(shard_dir, i)["input"])) for i in range(3)) == 5
+
+
+def test_merge_restores_input_order(dataset, tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    partition(dataset, shard_dir, 3, chunksize=8)
+    fake_build(shard_dir, 3)
+
+    output = str(tmp_path / "result.csv")
+    merge(shard_dir, 3, output)
+
+    rows = read_rows(output)
+    assert rows[0] == OUTPUT_COLUMNS
+    assert [row[0] for row in rows[1:]] == URLS
+
+
+def test_merge_refuses_missing_shards(dataset, tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    partition(dataset, shard_dir, 3)
+    with pytest.raises(FileNotFoundError):
+        merge(shard_dir, 3, str(tmp_path / "result.csv"))
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+from features.store import DAY, FeatureStore
+from utils.timeouts import FEATURE_TIMEOUT
+
+URL = "http://example.test/"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "features.sqlite")
+
+
+def test_values_expire_with_their_ttl(path):
+    store = FeatureStore(path, ttls={"safe_browsing": DAY, "uses_https": float("inf")},
+                         versions={"safe_browsing": 1, "uses_https": 1})
+    store.put(URL, {"safe_browsing": 1, "uses_https": 0}, now=0)
+
+    assert store.fresh(URL, now=DAY - 1) == {"safe_browsing": 1, "uses_https": 0}
+    assert store.fresh(URL, now=DAY) == {"uses_https": 0}
+
+    # A shorter TTL configured later applies to values already stored.
+    shorter = FeatureStore(path, ttls={"safe_browsing": 60, "uses_https": float("inf")},
+                           versions={"safe_browsing": 1, "uses_https": 1})
+    assert shorter.fresh(URL, now=60) == {"uses_https": 0}
+
+
+def test_version_bump_invalidates_stored_values(path):
+    ttls = {"safe_browsing": DAY, "uses_https": DAY}
+    FeatureStore(path, ttls=ttls, versions={"safe_browsing": 1, "uses_https": 1}).put(
+        URL, {"safe_browsing": 1, "uses_https": 0}, now=0
+    )
+
+    bumped = FeatureStore(path, ttls=ttls, versions={"safe_browsing": 2, "uses_https": 1})
+    assert bumped.fresh(URL, now=1) == {"uses_https": 0}
+    bumped.put(URL, {"safe_browsing": 0}, now=2)
+    assert bumped.fresh(URL, now=3) == {"safe_browsing": 0, "uses_https": 0}
+
+
+def test_errors_and_timeouts_are_not_stored(path):
+    store = FeatureStore(path, ttls={"safe_browsing": DAY, "uses_https": DAY},
+                         versions={"safe_browsing": 1, "uses_https": 1})
+    store.put(URL, {"safe_browsing": -1, "uses_https": FEATURE_TIMEOUT}, now=0)
+    assert store.fresh(URL, now=1) == {}
+
+
+def test_puts_are_committed_for_other_connections(path):
+    versions = {"uses_https": 1}
+    FeatureStore(path, ttls={"uses_https": DAY}, versions=versions).put(URL, {"uses_https": 1}, now=0)
+    assert FeatureStore(path, ttls={"uses_https": DAY}, versions=versions).fresh(URL, now=1) == {"uses_https": 1}
+
+
+def test_locked_store_degrades_to_not_stored(path, capsys):
+    store = FeatureStore(path, ttls={"uses_https": DAY}, versions={"uses_https": 1})
+    store.put(URL, {"uses_https": 1}, now=0)
+    store._connect().execute("PRAGMA busy_timeout = 0")
+
+    other = sqlite3.connect(path)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        store.put("http://other.test/", {"uses_https": 1}, now=0)
+    finally:
+        other.rollback()
+        other.close()
+    assert "não armazenados" in capsys.readouterr().out
+    assert store.fresh("http://other.test/", now=1) == {}
+    assert store.fresh(URL, now=1) == {"uses_https": 1}
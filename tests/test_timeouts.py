@@ -0,0 +1,33 @@
+import time
+
+from utils.metrics import metrics
+from utils.timeouts import AdaptiveTimeouts
+
+
+def call(name, seconds=0.0, hit=None):
+    with metrics.track(name) as tracked:
+        if hit is not None:
+            metrics.cache(f"{name}_cache", hit)
+        time.sleep(seconds)
+        tracked.result = 0
+
+
+def test_cache_hits_do_not_shrink_the_timeout():
+    timeouts = AdaptiveTimeouts(timeouts={"slow_service": 10.0}, min_samples=5, floor=0.01)
+    for _ in range(5):
+        call("slow_service", 0.2, hit=False)
+    for _ in range(200):
+        call("slow_service", hit=True)
+
+    assert metrics.quantile("slow_service", 0.99)[0] == 205
+    assert metrics.upstream_quantile("slow_service", 0.99)[0] == 5
+    assert timeouts.get("slow_service") >= 0.4
+
+
+def test_calls_without_a_cache_count_as_upstream():
+    timeouts = AdaptiveTimeouts(timeouts={"plain_service": 10.0}, min_samples=5)
+    assert timeouts.get("plain_service") == 10.0
+    for _ in range(5):
+        call("plain_service", 0.01)
+    assert metrics.upstream_quantile("plain_service", 0.99)[0] == 5
+    assert timeouts.get("plain_service") == timeouts.floor
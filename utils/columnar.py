@@ -0,0 +1,108 @@
+import json
+import os
+from typing import List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from features.names import FEATURE_NAMES
+
+FEATURE_COLUMNS = FEATURE_NAMES
+# Bump when feature semantics or the column layout change.
+SCHEMA_VERSION = 1
+
+SCHEMA = pa.schema(
+    [pa.field(name, pa.int8()) for name in FEATURE_COLUMNS]
+    + [
+        pa.field("url", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("label", pa.int8()),
+    ],
+    metadata={"feature_order": json.dumps(FEATURE_COLUMNS), "schema_version": str(SCHEMA_VERSION)},
+)
+
+FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".csv": "csv"}
+
+
+def manifest_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".manifest.json"
+
+
+def columnar_path(csv_path: str, fmt: str) -> str:
+    return os.path.splitext(csv_path)[0] + (".parquet" if fmt == "parquet" else ".arrow")
+
+
+def _to_table(chunk: pd.DataFrame) -> pa.Table:
+    arrays = [pa.array(chunk[name].to_numpy(dtype="int8"), type=pa.int8()) for name in FEATURE_COLUMNS]
+    arrays.append(pa.array(chunk["url"].astype(str)).dictionary_encode())
+    arrays.append(pa.array(chunk["label"].to_numpy(dtype="int8"), type=pa.int8()))
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def write_columnar(csv_path: str, out_path: str, chunksize: int = 100000) -> int:
+    """
+    Converts a feature CSV written by dataset_builder into Parquet or Arrow
+    IPC (chosen by extension) with int8 features and a dictionary-encoded
+    URL column, plus a manifest with the feature order. Returns the row count.
+    """
+    fmt = FORMATS[os.path.splitext(out_path)[1]]
+    rows = 0
+    chunks = pd.read_csv(csv_path, chunksize=chunksize)
+    if fmt == "parquet":
+        with pq.ParquetWriter(out_path, SCHEMA) as writer:
+            for chunk in chunks:
+                writer.write_table(_to_table(chunk))
+                rows += len(chunk)
+    else:
+        # The IPC file format needs one dictionary for the whole file.
+        table = pa.concat_tables(_to_table(chunk) for chunk in chunks).unify_dictionaries()
+        rows = table.num_rows
+        with pa.OSFile(out_path, "wb") as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(table.combine_chunks())
+
+    with open(manifest_path(out_path), "w") as f:
+        json.dump(
+            {
+                "format": fmt,
+                "schema_version": SCHEMA_VERSION,
+                "rows": rows,
+                "features": FEATURE_COLUMNS,
+                "columns": {field.name: str(field.type) for field in SCHEMA},
+            },
+            f,
+            indent=2,
+        )
+    return rows
+
+
+def feature_order(path: str) -> List[str]:
+    manifest = manifest_path(path)
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            return json.load(f)["features"]
+    return FEATURE_COLUMNS
+
+
+def load_features(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Loads a feature table from CSV, Parquet or Arrow IPC. Columnar files are
+    memory-mapped; Arrow IPC is read without copying the feature buffers.
+    """
+    fmt = FORMATS.get(os.path.splitext(path)[1], "csv")
+    if fmt == "csv":
+        df = pd.read_csv(path, usecols=columns)
+        features = [c for c in FEATURE_COLUMNS + ["label"] if c in df.columns]
+        return df.astype({c: "int8" for c in features})
+    if fmt == "parquet":
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    return table.to_pandas(split_blocks=True)
+
+
+def load_xy(path: str) -> Tuple[pd.DataFrame, pd.Series]:
+    """Feature matrix in manifest order and the label column."""
+    df = load_features(path)
+    return df[feature_order(path)], df["label"]
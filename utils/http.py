@@ -0,0 +1,134 @@
+import os
+from typing import Iterable, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+# Sent on every request, by the sync client and the engine's aiohttp session.
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9"
+}
+
+# Statuses worth retrying on the API calls (ipinfo, Google, Safe Browsing).
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Upstream lookups used when there is no local GeoIP database, and for the
+# Google index check. Overridable so they can point at a stand-in.
+IPINFO_URL = os.getenv("IPINFO_URL", "https://ipinfo.io/{ip}/json")
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.google.com/search?q=site:{domain}")
+
+
+class HTTPClient:
+    """
+    Process-wide HTTP client. `api` is a keep-alive session with retries
+    and backoff for the upstream APIs; it is an HTTP/2 httpx client when
+    http2 is on and httpx is installed. Target pages go through `fetch`,
+    which never retries (a dead host should fail fast) and streams the body
+    only up to a byte cap.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        pool_hosts: int = 100,
+        retries: int = 2,
+        backoff: float = 0.3,
+        http2: bool = False,
+        max_body: int = 256 * 1024,
+    ):
+        self.pool_size = pool_size
+        self.max_body = max_body
+        self.api = self._httpx_client(pool_size, retries) if http2 else None
+        if self.api is None:
+            retry = Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+                raise_on_status=False,
+            )
+            self.api = self._session(
+                HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=retry)
+            )
+        self.pages = self._session(
+            HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=0)
+        )
+
+    @classmethod
+    def from_env(cls) -> "HTTPClient":
+        return cls(
+            pool_size=int(os.getenv("HTTP_POOL_SIZE", 10)),
+            pool_hosts=int(os.getenv("HTTP_POOL_HOSTS", 100)),
+            retries=int(os.getenv("HTTP_RETRIES", 2)),
+            backoff=float(os.getenv("HTTP_BACKOFF", 0.3)),
+            http2=os.getenv("HTTP2", "0") == "1",
+            max_body=int(os.getenv("HTTP_MAX_BODY", 256 * 1024)),
+        )
+
+    @staticmethod
+    def _session(adapter: HTTPAdapter) -> requests.Session:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @staticmethod
+    def _httpx_client(pool_size: int, retries: int):
+        try:
+            import httpx
+        except ImportError:
+            print("[HTTP] httpx não instalado; usando HTTP/1.1")
+            return None
+        return httpx.Client(
+            http2=True,
+            headers=HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=pool_size),
+            # httpx only retries failed connects, not error statuses.
+            transport=httpx.HTTPTransport(http2=True, retries=retries),
+        )
+
+    def get(self, url: str, **kwargs):
+        return self.api.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.api.post(url, **kwargs)
+
+    def read_capped(self, url: str, timeout: float, max_bytes: Optional[int] = None) -> Tuple[object, bytes]:
+        """GET on the API client, reading at most max_bytes (default max_body) of the body."""
+        limit = self.max_body if max_bytes is None else max_bytes
+        if isinstance(self.api, requests.Session):
+            with self.api.get(url, timeout=timeout, stream=True) as response:
+                return response, _read(response.iter_content(16384), limit)
+        with self.api.stream("GET", url, timeout=timeout) as response:
+            return response, _read(response.iter_bytes(), limit)
+
+    def fetch(
+        self, url: str, timeout: float, max_bytes: int = 0, verify: bool = False
+    ) -> Tuple[requests.Response, bytes]:
+        """
+        Follows redirects to the final page and returns its response with
+        at most max_bytes of the body; the default reads headers only.
+        """
+        with self.pages.get(url, timeout=timeout, verify=verify, stream=True) as response:
+            return response, _read(response.iter_content(16384), max_bytes)
+
+
+def _read(chunks: Iterable[bytes], limit: int) -> bytes:
+    if limit <= 0:
+        return b""
+    body = bytearray()
+    for chunk in chunks:
+        body += chunk
+        if len(body) >= limit:
+            break
+    return bytes(body[:limit])
+
+
+http_client = HTTPClient.from_env()
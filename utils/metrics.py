@@ -0,0 +1,278 @@
+import bisect
+import contextvars
+import copy
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds. The last
+# bucket (+Inf) is implicit.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+OUTCOMES = ("success", "error", "timeout")
+
+# Check (or stage) currently running in this thread / task, so caches and
+# HTTP calls deep inside it can report against it.
+_current: contextvars.ContextVar[Optional["Call"]] = contextvars.ContextVar("current_check", default=None)
+
+
+def is_timeout(error: BaseException) -> bool:
+    # Covers socket/asyncio timeouts plus requests' and dnspython's own types.
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+class Call:
+    """
+    One tracked call. `result` is the normalized check value, -1 on failure.
+    `cached` and `upstream` record whether a cache or dedup hit answered
+    it, and whether anything had to go out to the service.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.result = None
+        self.outcome: Optional[str] = None
+        self.cached = False
+        self.upstream = False
+
+    @property
+    def reached_upstream(self) -> bool:
+        # Calls that touch no cache at all (pure computation, plain HTTP) count too.
+        return self.upstream or not self.cached
+
+    def fail(self, error: BaseException) -> None:
+        # A timeout anywhere in the call wins over a later generic error.
+        if self.outcome != "timeout":
+            self.outcome = "timeout" if is_timeout(error) else "error"
+
+
+@dataclass
+class CheckStats:
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    outcomes: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(OUTCOMES, 0))
+    cache_hits: int = 0
+    cache_misses: int = 0
+    bytes: int = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets)
+
+    def observe(self, seconds: float, outcome: str) -> None:
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.outcomes[outcome] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th call, in seconds."""
+        count = self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for bound, n in zip(BUCKETS + (self.max_seconds,), self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+    def merge(self, other: "CheckStats") -> None:
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.total_seconds += other.total_seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+        for outcome, n in other.outcomes.items():
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + n
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        self.bytes += other.bytes
+
+    def snapshot(self) -> Dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "count": self.count,
+            "outcomes": dict(self.outcomes),
+            "total_seconds": self.total_seconds,
+            "max_seconds": self.max_seconds,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "buckets": list(self.buckets),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hits / lookups if lookups else None,
+            "bytes": self.bytes,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict) -> "CheckStats":
+        return cls(
+            buckets=list(data["buckets"]),
+            total_seconds=data["total_seconds"],
+            max_seconds=data["max_seconds"],
+            outcomes=dict(data["outcomes"]),
+            cache_hits=data["cache_hits"],
+            cache_misses=data["cache_misses"],
+            bytes=data["bytes"],
+        )
+
+
+class Metrics:
+    """
+    Per-check latency histograms, outcome counts, cache hit rates and bytes
+    transferred. Checks are tracked where they are dispatched (builder_csv
+    and engine); caches and HTTP calls report to whichever check is
+    running, or to their own name when called outside one.
+
+    Calls that reached the upstream are also kept in a second, per-check
+    histogram: cache and dedup hits return in microseconds and would drag
+    any quantile used to size timeouts down to nothing.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, CheckStats] = {}
+        self._upstream: Dict[str, CheckStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, stats_by_name: Optional[Dict[str, CheckStats]] = None) -> CheckStats:
+        stats_by_name = self._stats if stats_by_name is None else stats_by_name
+        stats = stats_by_name.get(name)
+        if stats is None:
+            stats = stats_by_name.setdefault(name, CheckStats())
+        return stats
+
+    @contextmanager
+    def track(self, name: str):
+        call = Call(name)
+        token = _current.set(call)
+        started = time.perf_counter()
+        try:
+            yield call
+        except BaseException as e:
+            call.fail(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            outcome = call.outcome or ("error" if call.result == -1 else "success")
+            with self._lock:
+                self._get(name).observe(elapsed, outcome)
+                if call.reached_upstream:
+                    self._get(name, self._upstream).observe(elapsed, outcome)
+
+    def failed(self, error: BaseException) -> None:
+        """Records an error a check caught and turned into -1."""
+        call = _current.get()
+        if call is not None:
+            call.fail(error)
+
+    def cache(self, cache: str, hit: bool) -> None:
+        call = _current.get()
+        if call is not None:
+            if hit:
+                call.cached = True
+            else:
+                call.upstream = True
+        with self._lock:
+            for name in {cache, call.name if call else cache}:
+                stats = self._get(name)
+                if hit:
+                    stats.cache_hits += 1
+                else:
+                    stats.cache_misses += 1
+
+    def transferred(self, nbytes: int, name: Optional[str] = None) -> None:
+        call = _current.get()
+        if call is not None:
+            call.upstream = True
+        name = name or (call.name if call else "other")
+        with self._lock:
+            self._get(name).bytes += nbytes
+
+    def quantile(self, name: str, q: float) -> Tuple[int, float]:
+        """Number of calls recorded for name and their q-quantile, in seconds."""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                return 0, 0.0
+            return stats.count, stats.quantile(q)
+
+    def upstream_quantile(self, name: str, q: float) -> Tuple[int, float]:
+        """Like quantile, over only the calls of name that reached the upstream."""
+        with self._lock:
+            stats = self._upstream.get(name)
+            if stats is None:
+                return 0, 0.0
+            return stats.count, stats.quantile(q)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in sorted(self._stats.items())}
+
+    def merge(self, snapshot: Dict[str, Dict]) -> None:
+        """Adds a snapshot taken in another process, e.g. a shard."""
+        with self._lock:
+            for name, data in snapshot.items():
+                self._get(name).merge(CheckStats.from_snapshot(data))
+
+    def to_json(self) -> str:
+        return json.dumps({"buckets": list(BUCKETS), "checks": self.snapshot()}, indent=2)
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            items = sorted(copy.deepcopy(self._stats).items())
+
+        # The text format wants every sample of a metric family in one group.
+        lines = ["# TYPE url_check_duration_seconds histogram"]
+        for name, stats in items:
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), stats.buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'url_check_duration_seconds_bucket{{check="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'url_check_duration_seconds_sum{{check="{name}"}} {stats.total_seconds}')
+            lines.append(f'url_check_duration_seconds_count{{check="{name}"}} {stats.count}')
+        lines.append("# TYPE url_check_calls_total counter")
+        for name, stats in items:
+            for outcome, n in stats.outcomes.items():
+                lines.append(f'url_check_calls_total{{check="{name}",outcome="{outcome}"}} {n}')
+        lines.append("# TYPE url_check_cache_total counter")
+        for name, stats in items:
+            lines.append(f'url_check_cache_total{{check="{name}",result="hit"}} {stats.cache_hits}')
+            lines.append(f'url_check_cache_total{{check="{name}",result="miss"}} {stats.cache_misses}')
+        lines.append("# TYPE url_check_bytes_total counter")
+        for name, stats in items:
+            lines.append(f'url_check_bytes_total{{check="{name}"}} {stats.bytes}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """Writes Prometheus text for .prom/.txt paths, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+    def summary(self) -> str:
+        """Table of every check, slowest total time first."""
+        header = (
+            f"{'check':<28}{'calls':>8}{'ok':>8}{'err':>7}{'tmo':>7}"
+            f"{'p50ms':>9}{'p95ms':>9}{'maxms':>9}{'total s':>10}{'cache':>8}{'KiB':>10}"
+        )
+        rows = [header, "-" * len(header)]
+        snapshot = self.snapshot()
+        for name, s in sorted(snapshot.items(), key=lambda item: -item[1]["total_seconds"]):
+            hit_rate = f"{s['cache_hit_rate']:.0%}" if s["cache_hit_rate"] is not None else "-"
+            rows.append(
+                f"{name:<28}{s['count']:>8}{s['outcomes']['success']:>8}{s['outcomes']['error']:>7}"
+                f"{s['outcomes']['timeout']:>7}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}"
+                f"{s['max_seconds'] * 1000:>9.1f}{s['total_seconds']:>10.1f}{hit_rate:>8}"
+                f"{s['bytes'] / 1024:>10.1f}"
+            )
+        return "\n".join(rows)
+
+
+metrics = Metrics()
@@ -0,0 +1,302 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Requests per second allowed for each upstream. None means no rate budget,
+# only the concurrency caps apply. Overridable with RATE_LIMIT_<SERVICE>.
+SERVICE_RATES = {
+    "target": None,
+    "safe_browsing": 10.0,
+    "ipinfo": 4.0,
+    "google": 0.5,
+    "rbl": 20.0,
+    "whois": 1.0,
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes one token and returns how many seconds the caller must wait
+        before using it. The balance may go negative, which queues callers
+        in arrival order without holding a lock while they sleep.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self) -> None:
+        """Gives back a token reserved by a caller that gave up before using it."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+@dataclass
+class ServiceStats:
+    queued: int = 0
+    in_flight: int = 0
+    completed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "avg_wait_ms": (self.total_wait / self.completed * 1000) if self.completed else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _SharedSemaphore:
+    """
+    Counting semaphore shared by threads and coroutines (on any event loop),
+    so the thread-based checks and the engine draw on the same permits.
+    Waiters are served in arrival order; release() hands the permit straight
+    to the oldest one.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self) -> bool:
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return True
+        return False
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        waiter.wait()
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except BaseException:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            if not queued:
+                # The permit was already handed over; pass it on.
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(_wake, future)
+                    return
+                except RuntimeError:
+                    # Its event loop is closed; nobody is waiting there anymore.
+                    continue
+            self._value += 1
+
+
+class _KeyedSemaphores:
+    """Per-key semaphores that are dropped once nobody holds or waits on them."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def acquire_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [self._factory(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def release_entry(self, key) -> None:
+        with self._lock:
+            entry = self._entries[key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._entries[key]
+
+
+class Scheduler:
+    """
+    Gates outbound calls by a global in-flight cap, a per-host concurrency
+    cap and a per-service token bucket. slot() is for the asyncio engine and
+    slot_sync() for the thread-based checks; both share the same caps and
+    buckets.
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, Optional[float]]] = None,
+        per_host: int = 4,
+        global_limit: int = 256,
+    ):
+        self.rates = dict(SERVICE_RATES if rates is None else rates)
+        self.per_host = per_host
+        self.global_limit = global_limit
+        self._buckets = {
+            service: TokenBucket(rate) for service, rate in self.rates.items() if rate
+        }
+        self._stats: Dict[str, ServiceStats] = {}
+        self._stats_lock = threading.Lock()
+        self._global = _SharedSemaphore(global_limit)
+        self._hosts = _KeyedSemaphores(lambda: _SharedSemaphore(self.per_host))
+
+    @classmethod
+    def from_env(cls) -> "Scheduler":
+        rates = {}
+        for service, default in SERVICE_RATES.items():
+            value = os.getenv(f"RATE_LIMIT_{service.upper()}")
+            rates[service] = float(value) if value else default
+        return cls(
+            rates=rates,
+            per_host=int(os.getenv("MAX_PER_HOST", 4)),
+            global_limit=int(os.getenv("MAX_IN_FLIGHT", 256)),
+        )
+
+    def scale(self, factor: float) -> None:
+        """
+        Multiplies every per-service budget by factor, e.g. 1/N for each of
+        N processes sharing the same upstream quotas.
+        """
+        for service, rate in self.rates.items():
+            if rate:
+                self.rates[service] = rate * factor
+                self._buckets[service] = TokenBucket(rate * factor)
+
+    def _service(self, service: str) -> ServiceStats:
+        with self._stats_lock:
+            return self._stats.setdefault(service, ServiceStats())
+
+    def _update(self, stats: ServiceStats, **deltas) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                setattr(stats, name, getattr(stats, name) + delta)
+
+    def _finish_wait(self, stats: ServiceStats, started: float) -> None:
+        waited = time.monotonic() - started
+        with self._stats_lock:
+            stats.queued -= 1
+            stats.in_flight += 1
+            stats.total_wait += waited
+            stats.max_wait = max(stats.max_wait, waited)
+
+    def _abandon(self, stats: ServiceStats, host: str, acquired, bucket: Optional[TokenBucket]) -> None:
+        """Undoes a wait given up before the call: permits and the unused token."""
+        self._update(stats, queued=-1)
+        if bucket is not None:
+            bucket.refund()
+        for sem in acquired:
+            sem.release()
+        self._hosts.release_entry(host)
+
+    def _release(self, stats: ServiceStats, host: str, host_sem: _SharedSemaphore) -> None:
+        self._global.release()
+        host_sem.release()
+        self._hosts.release_entry(host)
+        self._update(stats, in_flight=-1, completed=1)
+
+    @asynccontextmanager
+    async def slot(self, service: str, host: Optional[str] = None):
+        stats = self._service(service)
+        host = host or service
+        started = time.monotonic()
+        self._update(stats, queued=1)
+        host_sem = self._hosts.acquire_entry(host)
+        acquired, reserved = [], None
+        try:
+            await host_sem.acquire_async()
+            acquired.append(host_sem)
+            bucket = self._buckets.get(service)
+            if bucket:
+                delay, reserved = bucket.reserve(), bucket
+                if delay:
+                    await asyncio.sleep(delay)
+            await self._global.acquire_async()
+            acquired.append(self._global)
+        except BaseException:
+            self._abandon(stats, host, acquired, reserved)
+            raise
+        self._finish_wait(stats, started)
+        try:
+            yield
+        finally:
+            self._release(stats, host, host_sem)
+
+    @contextmanager
+    def slot_sync(self, service: str, host: Optional[str] = None):
+        stats = self._service(service)
+        host = host or service
+        started = time.monotonic()
+        self._update(stats, queued=1)
+        host_sem = self._hosts.acquire_entry(host)
+        acquired, reserved = [], None
+        try:
+            host_sem.acquire()
+            acquired.append(host_sem)
+            bucket = self._buckets.get(service)
+            if bucket:
+                delay, reserved = bucket.reserve(), bucket
+                if delay:
+                    time.sleep(delay)
+            self._global.acquire()
+            acquired.append(self._global)
+        except BaseException:
+            self._abandon(stats, host, acquired, reserved)
+            raise
+        self._finish_wait(stats, started)
+        try:
+            yield
+        finally:
+            self._release(stats, host, host_sem)
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        with self._stats_lock:
+            return {service: stats.snapshot() for service, stats in self._stats.items()}
+
+
+scheduler = Scheduler.from_env()
@@ -1,48 +1,445 @@
-import requests
+import asyncio
+import base64
+import hashlib
+import posixpath
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import quote, unquote, urlsplit
+
 import os
 from dotenv import load_dotenv
-from typing import Tuple
+
+from utils.http import http_client
+from utils.metrics import metrics
+from utils.rate_limit import scheduler
+from utils.timeouts import timeouts
 
 load_dotenv()
 
 API_KEY = os.getenv("GOOGLE_API_KEY")
-SAFE_BROWSING_API_URL = (
-    f"https://safebrowsing.googleapis.com/v4/threatMatches:find?key={API_KEY}"
-)
+API_BASE = os.getenv("SAFE_BROWSING_API_BASE", "https://safebrowsing.googleapis.com/v4")
+SAFE_BROWSING_API_URL = f"{API_BASE}/threatMatches:find?key={API_KEY}"
 
+CLIENT = {"clientId": "url-analyser-tool", "clientVersion": "1.0"}
+THREAT_TYPES = [
+    "MALWARE",
+    "SOCIAL_ENGINEERING",
+    "UNWANTED_SOFTWARE",
+    "POTENTIALLY_HARMFUL_APPLICATION",
+]
+# threatMatches:find accepts at most this many entries per request.
+MAX_BATCH_SIZE = 500
 
-def check_safe_browsing(url: str) -> Tuple[bool, str]:
-    """
-    Checks if the URL is present in the Google Safe Browsing database.
-    Returns a (bool, reason) tuple: True if malicious, False if clean.
-    """
-    payload = {
-        "client": {"clientId": "url-analyser-tool", "clientVersion": "1.0"},
+
+class SafeBrowsingError(Exception):
+    """No verdict could be obtained; never to be read as a clean URL."""
+
+
+def build_payload(urls: List[str]) -> dict:
+    return {
+        "client": CLIENT,
         "threatInfo": {
-            "threatTypes": [
-                "MALWARE",
-                "SOCIAL_ENGINEERING",
-                "UNWANTED_SOFTWARE",
-                "POTENTIALLY_HARMFUL_APPLICATION",
-            ],
+            "threatTypes": THREAT_TYPES,
             "platformTypes": ["ANY_PLATFORM"],
             "threatEntryTypes": ["URL"],
-            "threatEntries": [{"url": url}],
+            "threatEntries": [{"url": url} for url in urls],
         },
     }
 
+
+def parse_verdict(threats: Iterable[str]) -> Tuple[bool, str]:
+    threats = list(threats)
+    if threats:
+        return (
+            True,
+            f"Detectado pelo Google Safe Browsing como: {', '.join(threats)}",
+        )
+    else:
+        return False, "Nenhuma ameaça detectada pelo Google Safe Browsing."
+
+
+def _duration(value: Optional[str], default: float) -> float:
+    # API durations look like "300s" or "1.5s".
     try:
-        response = requests.post(SAFE_BROWSING_API_URL, json=payload)
+        return float(value.rstrip("s"))
+    except (AttributeError, ValueError):
+        return default
+
+
+def _canonical_url(url: str) -> Tuple[str, str]:
+    """
+    Host and path+query canonicalised as described for Safe Browsing v4
+    hash lookups (percent-unescape, lowercase host, normalise dots and
+    slashes, re-escape control/space/#/% characters).
+    """
+    url = re.sub(r"[\t\r\n]", "", url.strip()).split("#", 1)[0]
+    if "://" not in url:
+        url = "http://" + url
+    previous = None
+    while previous != url:
+        previous, url = url, unquote(url)
+    parts = urlsplit(url)
+    host = (parts.hostname or "").strip(".")
+    host = re.sub(r"\.{2,}", ".", host).lower()
+    path = posixpath.normpath(re.sub(r"/{2,}", "/", parts.path or "/"))
+    if path == ".":
+        path = "/"
+    if (parts.path or "/").endswith("/") and not path.endswith("/"):
+        path += "/"
+    if parts.query or url.endswith("?"):
+        path += "?" + parts.query
+
+    def escape(text: str) -> str:
+        return "".join(
+            ch if 32 < ord(ch) < 127 and ch not in "#%" else quote(ch, safe="") for ch in text
+        )
+
+    return escape(host), escape(path)
+
+
+def url_expressions(url: str) -> List[str]:
+    """Host-suffix / path-prefix expressions a URL is looked up under."""
+    host, path = _canonical_url(url)
+    hosts = [host]
+    if not re.fullmatch(r"[\d.]+", host):
+        labels = host.split(".")[-5:]
+        for i in range(len(labels) - 1):
+            candidate = ".".join(labels[i:])
+            if candidate != host:
+                hosts.append(candidate)
+    paths = [path]
+    bare = path.split("?", 1)[0]
+    if bare != path:
+        paths.append(bare)
+    segments = bare.split("/")[1:-1]
+    prefix = "/"
+    for segment in [""] + segments[:3]:
+        if segment:
+            prefix += segment + "/"
+        if prefix not in paths:
+            paths.append(prefix)
+    return [h + p for h in hosts[:5] for p in paths[:6]]
+
+
+class SafeBrowsingClient:
+    """
+    Google Safe Browsing v4 client shared by every caller of the process.
+
+    In "lookup" mode, URLs submitted concurrently are grouped into
+    threatMatches:find requests of up to batch_size entries, sent once the
+    batch is full or max_wait seconds after its first URL. In "update" mode
+    the client keeps the Update API hash-prefix lists in memory and only
+    calls fullHashes:find for URLs whose prefixes are listed. Verdicts are
+    cached per URL for the API's cacheDuration (negative_ttl for clean URLs).
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = API_KEY,
+        api_base: str = API_BASE,
+        mode: str = "lookup",
+        batch_size: int = MAX_BATCH_SIZE,
+        max_wait: float = 0.05,
+        negative_ttl: float = 300,
+        cache_size: int = 100000,
+        timeout: float = 10,
+        pool_size: int = 10,
+        session=None,
+    ):
+        self.api_key = api_key
+        self.api_base = api_base.rstrip("/")
+        self.mode = mode
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_wait = max_wait
+        self.negative_ttl = negative_ttl
+        self.cache_size = cache_size
+        self.timeout = timeout
+        # Shares the process-wide keep-alive pool (and retry policy) by default.
+        self.session = session or http_client.api
+        self._verdicts: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, Future]] = []
+        self._pending_cond = threading.Condition(self._lock)
+        self._batcher: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+        # Update API state.
+        self._lists: Dict[str, dict] = {}
+        self._prefixes: Dict[int, Set[bytes]] = {}
+        self._full_hashes: Dict[bytes, tuple] = {}
+        # Set by the first successful update; until then lookups are errors.
+        self._db_ready = threading.Event()
+        self._db_attempted = threading.Event()
+        self._update_error: Optional[str] = None
+        self._updater: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "SafeBrowsingClient":
+        return cls(
+            mode=os.getenv("SAFE_BROWSING_MODE", "lookup"),
+            batch_size=int(os.getenv("SAFE_BROWSING_BATCH_SIZE", MAX_BATCH_SIZE)),
+            max_wait=float(os.getenv("SAFE_BROWSING_MAX_WAIT", 0.05)),
+            negative_ttl=float(os.getenv("SAFE_BROWSING_NEGATIVE_TTL", 300)),
+        )
+
+    def _endpoint(self, method: str) -> str:
+        return f"{self.api_base}/{method}?key={self.api_key}"
+
+    def _post(self, method: str, payload: dict) -> dict:
+        with scheduler.slot_sync("safe_browsing"):
+            response = self.session.post(self._endpoint(method), json=payload, timeout=self.timeout)
+        metrics.transferred(len(response.content), "safe_browsing_api")
         response.raise_for_status()
-        data = response.json()
-
-        if "matches" in data:
-            threats = [match.get("threatType", "UNKNOWN") for match in data["matches"]]
-            return (
-                True,
-                f"Detectado pelo Google Safe Browsing como: {', '.join(threats)}",
-            )
-        else:
-            return False, "Nenhuma ameaça detectada pelo Google Safe Browsing."
+        return response.json()
+
+    def _cached(self, url: str) -> Optional[Tuple[bool, str]]:
+        with self._lock:
+            entry = self._verdicts.get(url)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._verdicts[url]
+                return None
+            self._verdicts.move_to_end(url)
+            return parse_verdict(entry[1])
+
+    def _remember(self, url: str, threats: Tuple[str, ...], ttl: float) -> None:
+        with self._lock:
+            self._verdicts[url] = (time.monotonic() + ttl, threats)
+            self._verdicts.move_to_end(url)
+            while len(self._verdicts) > self.cache_size:
+                self._verdicts.popitem(last=False)
+
+    def submit(self, url: str) -> Future:
+        verdict = self._cached(url)
+        metrics.cache("safe_browsing_cache", verdict is not None)
+        if verdict is not None:
+            future = Future()
+            future.set_result(verdict)
+            return future
+        if self.mode == "update":
+            return self._executor.submit(self._check_local, url)
+        future = Future()
+        with self._pending_cond:
+            if self._batcher is None:
+                self._batcher = threading.Thread(target=self._run_batcher, daemon=True)
+                self._batcher.start()
+            self._pending.append((url, future))
+            self._pending_cond.notify()
+        return future
+
+    def check(self, url: str, timeout: Optional[float] = None) -> Tuple[bool, str]:
+        return self.submit(url).result(timeout=timeout)
+
+    async def check_async(self, url: str) -> Tuple[bool, str]:
+        return await asyncio.wrap_future(self.submit(url))
+
+    # Lookup API -----------------------------------------------------------
+
+    def _run_batcher(self) -> None:
+        while True:
+            with self._pending_cond:
+                while not self._pending:
+                    self._pending_cond.wait()
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._pending_cond.wait(remaining)
+                batch = self._pending[: self.batch_size]
+                del self._pending[: self.batch_size]
+            self._executor.submit(self._send_batch, batch)
+
+    def _send_batch(self, batch: List[Tuple[str, Future]]) -> None:
+        urls = list(dict.fromkeys(url for url, _ in batch))
+        try:
+            data = self._post("threatMatches:find", build_payload(urls))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        threats: Dict[str, List[str]] = {url: [] for url in urls}
+        ttls: Dict[str, float] = {}
+        for match in data.get("matches", []):
+            url = match.get("threat", {}).get("url")
+            if url in threats:
+                threats[url].append(match.get("threatType", "UNKNOWN"))
+                ttl = _duration(match.get("cacheDuration"), self.negative_ttl)
+                ttls[url] = min(ttls.get(url, ttl), ttl)
+        for url in urls:
+            self._remember(url, tuple(threats[url]), ttls.get(url, self.negative_ttl))
+        for url, future in batch:
+            future.set_result(parse_verdict(threats[url]))
+
+    # Update API -----------------------------------------------------------
+
+    def _ensure_updater(self) -> None:
+        with self._lock:
+            if self._updater is None:
+                self._updater = threading.Thread(target=self._run_updater, daemon=True)
+                self._updater.start()
+
+    def _run_updater(self) -> None:
+        while True:
+            try:
+                wait = self.update_lists()
+                self._update_error = None
+                self._db_ready.set()
+            except Exception as e:
+                print(f"(safe_browsing) Error updating hash lists: {e}")
+                self._update_error = str(e)
+                wait = 60
+            self._db_attempted.set()
+            time.sleep(max(wait, 60))
+
+    def update_lists(self) -> float:
+        """
+        Fetches list updates (RAW compression) and applies them to the
+        in-memory prefix sets. Returns the minimum wait before the next call.
+        The new lists are swapped in at the end, so lookups running meanwhile
+        see either the old or the new state.
+        """
+        lists = dict(self._lists)
+        list_requests = [
+            {
+                "threatType": threat_type,
+                "platformType": "ANY_PLATFORM",
+                "threatEntryType": "URL",
+                "state": lists.get(threat_type, {}).get("state", ""),
+                "constraints": {"supportedCompressions": ["RAW"]},
+            }
+            for threat_type in THREAT_TYPES
+        ]
+        data = self._post("threatListUpdates:fetch", {"client": CLIENT, "listUpdateRequests": list_requests})
+        for update in data.get("listUpdateResponses", []):
+            threat_type = update["threatType"]
+            current = lists.get(threat_type, {"state": "", "prefixes": []})
+            prefixes = [] if update.get("responseType") == "FULL_UPDATE" else list(current["prefixes"])
+            # Every removal index refers to the list as it was before this
+            # update, so they are all applied in one pass.
+            drop = {
+                index
+                for removal in update.get("removals", [])
+                for index in removal.get("rawIndices", {}).get("indices", [])
+            }
+            if drop:
+                prefixes = [p for i, p in enumerate(prefixes) if i not in drop]
+            for addition in update.get("additions", []):
+                raw = addition.get("rawHashes", {})
+                size = raw.get("prefixSize", 4)
+                blob = base64.b64decode(raw.get("rawHashes", ""))
+                prefixes.extend(blob[i:i + size] for i in range(0, len(blob), size))
+            prefixes.sort()
+
+            expected = update.get("checksum", {}).get("sha256")
+            if expected and base64.b64decode(expected) != hashlib.sha256(b"".join(prefixes)).digest():
+                # Out of sync: drop the state so the next fetch is a full update.
+                print(f"(safe_browsing) Checksum mismatch for {threat_type}, resetting list")
+                lists[threat_type] = {"state": "", "prefixes": []}
+                continue
+            lists[threat_type] = {"state": update.get("newClientState", ""), "prefixes": prefixes}
+
+        index: Dict[int, Set[bytes]] = {}
+        for entry in lists.values():
+            for prefix in entry["prefixes"]:
+                index.setdefault(len(prefix), set()).add(prefix)
+        with self._lock:
+            self._lists = lists
+            self._prefixes = index
+        return _duration(data.get("minimumWaitDuration"), 1800)
+
+    def _matching_prefixes(self, hashes: List[bytes]) -> Set[bytes]:
+        found = set()
+        for full in hashes:
+            for size, prefixes in self._prefixes.items():
+                if full[:size] in prefixes:
+                    found.add(full[:size])
+        return found
+
+    def _check_local(self, url: str) -> Tuple[bool, str]:
+        self._ensure_updater()
+        self._db_attempted.wait(self.timeout)
+        if not self._db_ready.is_set():
+            # An empty list would pass every URL as clean; fail and cache
+            # nothing until the first update succeeds.
+            raise SafeBrowsingError(self._update_error or "hash lists not loaded yet")
+        hashes = [hashlib.sha256(expr.encode()).digest() for expr in url_expressions(url)]
+        prefixes = self._matching_prefixes(hashes)
+        if not prefixes:
+            self._remember(url, (), self.negative_ttl)
+            return parse_verdict(())
+
+        now = time.monotonic()
+        threats = []
+        unresolved = []
+        for full in hashes:
+            entry = self._full_hashes.get(full)
+            if entry is not None and entry[0] > now:
+                threats.extend(entry[1])
+            elif any(full.startswith(p) for p in prefixes):
+                unresolved.append(full)
+        if unresolved:
+            threats.extend(self._find_full_hashes(prefixes, set(unresolved)))
+        threats = tuple(dict.fromkeys(threats))
+        self._remember(url, threats, self.negative_ttl)
+        return parse_verdict(threats)
+
+    def _find_full_hashes(self, prefixes: Set[bytes], wanted: Set[bytes]) -> List[str]:
+        with self._lock:
+            states = [entry["state"] for entry in self._lists.values()]
+        payload = {
+            "client": CLIENT,
+            "clientStates": states,
+            "threatInfo": {
+                "threatTypes": THREAT_TYPES,
+                "platformTypes": ["ANY_PLATFORM"],
+                "threatEntryTypes": ["URL"],
+                "threatEntries": [{"hash": base64.b64encode(p).decode()} for p in prefixes],
+            },
+        }
+        data = self._post("fullHashes:find", payload)
+        now = time.monotonic()
+        found: Dict[bytes, List[str]] = {}
+        for match in data.get("matches", []):
+            full = base64.b64decode(match.get("threat", {}).get("hash", ""))
+            ttl = _duration(match.get("cacheDuration"), self.negative_ttl)
+            found.setdefault(full, []).append(match.get("threatType", "UNKNOWN"))
+            self._full_hashes[full] = (now + ttl, tuple(found[full]))
+        negative_ttl = _duration(data.get("negativeCacheDuration"), self.negative_ttl)
+        for full in wanted - set(found):
+            self._full_hashes[full] = (now + negative_ttl, ())
+        return [threat for full in wanted for threat in found.get(full, [])]
+
+
+safe_browsing = SafeBrowsingClient.from_env()
+
+
+def check_safe_browsing(url: str) -> Union[Tuple[bool, str], int]:
+    """
+    Checks if the URL is present in the Google Safe Browsing database.
+    Returns a (bool, reason) tuple: True if malicious, False if clean; -1
+    when no verdict could be obtained (API error, timeout, lists not loaded).
+    """
+    try:
+        return safe_browsing.check(url, timeouts.get("safe_browsing"))
+    except Exception as e:
+        print(f"(check_safe_browsing) Error in {url}: {e}")
+        metrics.failed(e)
+        return -1
+
+
+async def check_safe_browsing_async(url: str) -> Union[Tuple[bool, str], int]:
+    """
+    Same as check_safe_browsing, without blocking the event loop.
+    """
+    try:
+        return await safe_browsing.check_async(url)
     except Exception as e:
-        return False, f"Erro ao verificar: {e}"
+        print(f"(check_safe_browsing) Error in {url}: {e}")
+        metrics.failed(e)
+        return -1
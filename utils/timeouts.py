@@ -0,0 +1,92 @@
+import os
+import time
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+from utils.metrics import metrics
+
+load_dotenv()
+
+# Feature value for a check that did not finish within its timeout or the
+# URL's deadline. Errors stay -1.
+FEATURE_TIMEOUT = -2
+
+# Upper bound, in seconds, for each network-bound check and for the shared
+# page fetch. Overridable with TIMEOUT_<NAME>. Checks not listed only look
+# at the URL string and use DEFAULT_TIMEOUT.
+CHECK_TIMEOUTS = {
+    "fetch": 10.0,
+    "safe_browsing": 5.0,
+    "listed_in_rbl": 5.0,
+    "ip_from_untrusted_country": 5.0,
+    "indexed_by_google": 5.0,
+    "has_low_domain_age": 10.0,
+    "has_few_days_to_expire": 10.0,
+}
+DEFAULT_TIMEOUT = 1.0
+
+
+class AdaptiveTimeouts:
+    """
+    Per-check timeouts derived from the latencies metrics has recorded for
+    calls that reached the upstream (cache and dedup hits say nothing about
+    how long the service takes): multiplier times the observed quantile,
+    kept between floor and the configured timeout. Until a check has
+    min_samples such calls its configured timeout is used as is.
+    """
+
+    def __init__(
+        self,
+        timeouts: Optional[Dict[str, float]] = None,
+        deadline: Optional[float] = 30.0,
+        quantile: float = 0.99,
+        multiplier: float = 2.0,
+        floor: float = 0.5,
+        min_samples: int = 50,
+    ):
+        self.timeouts = dict(CHECK_TIMEOUTS if timeouts is None else timeouts)
+        self.deadline = deadline
+        self.quantile = quantile
+        self.multiplier = multiplier
+        self.floor = floor
+        self.min_samples = min_samples
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveTimeouts":
+        timeouts = {}
+        for name, default in CHECK_TIMEOUTS.items():
+            value = os.getenv(f"TIMEOUT_{name.upper()}")
+            timeouts[name] = float(value) if value else default
+        deadline = float(os.getenv("URL_DEADLINE", 30))
+        return cls(
+            timeouts=timeouts,
+            deadline=deadline or None,
+            quantile=float(os.getenv("ADAPTIVE_TIMEOUT_QUANTILE", 0.99)),
+            multiplier=float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", 2.0)),
+            min_samples=int(os.getenv("ADAPTIVE_TIMEOUT_MIN_SAMPLES", 50)),
+        )
+
+    def get(self, name: str) -> float:
+        ceiling = self.timeouts.get(name, DEFAULT_TIMEOUT)
+        count, observed = metrics.upstream_quantile(name, self.quantile)
+        if count < self.min_samples:
+            return ceiling
+        return min(ceiling, max(self.floor, observed * self.multiplier))
+
+    def deadline_at(self, now: Optional[float] = None) -> Optional[float]:
+        """Monotonic time by which a URL started now must be finished."""
+        if self.deadline is None:
+            return None
+        return (time.monotonic() if now is None else now) + self.deadline
+
+    def budget(self, name: str, deadline: Optional[float], now: Optional[float] = None) -> float:
+        """Timeout for one check: its adaptive timeout, capped by what is left of the deadline."""
+        timeout = self.get(name)
+        if deadline is None:
+            return timeout
+        remaining = deadline - (time.monotonic() if now is None else now)
+        return max(0.0, min(timeout, remaining))
+
+
+timeouts = AdaptiveTimeouts.from_env()